@@ -27,7 +27,7 @@ def main(args):
         )
     else:
         # Standard Lambda mode: single call
-        client = LambdaRuntimeClient(api_addr, use_thread)
+        client = LambdaRuntimeClient(api_addr, use_thread, defer_result_posts=True)
         bootstrap.run(handler, client)
 
 
@@ -2,13 +2,20 @@
 Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
 """
 
+import collections
+import contextvars
 import importlib
+import itertools
 import json
 import logging
+import mmap
 import os
 import sys
+import threading
 import time
 import traceback
+from collections.abc import AsyncIterator, Awaitable, Iterator
+from functools import partial
 
 from .lambda_context import LambdaContext
 from .lambda_runtime_client import LambdaRuntimeClient
@@ -20,10 +27,17 @@ from .lambda_runtime_log_utils import (
     _TEXT_FRAME_TYPES,
     JsonFormatter,
     LogFormat,
+    LogRateLimiter,
+    TextFormatter,
     _format_log_level,
     _get_log_level_from_env_var,
 )
-from .lambda_runtime_marshaller import to_json
+from .lambda_runtime_marshaller import (
+    _BINARY_RESPONSE_TYPES,
+    RAW_PAYLOAD_ATTRIBUTE,
+    LambdaResponse,
+    to_json,
+)
 
 ERROR_LOG_LINE_TERMINATE = "\r"
 ERROR_LOG_IDENT = "\u00a0"  # NO-BREAK SPACE U+00A0
@@ -32,8 +46,34 @@ _AWS_LAMBDA_LOG_LEVEL = _get_log_level_from_env_var(
     os.environ.get("AWS_LAMBDA_LOG_LEVEL")
 )
 AWS_LAMBDA_INITIALIZATION_TYPE = "AWS_LAMBDA_INITIALIZATION_TYPE"
+# Set to "true" to have FramedTelemetryLogSink batch frames into one writev per flush.
+AWS_LAMBDA_LOG_BATCHING = "AWS_LAMBDA_LOG_BATCHING"
+# Set to "true" to write logs from a background thread, see AsyncLogSink.
+AWS_LAMBDA_ASYNC_LOGGING = "AWS_LAMBDA_ASYNC_LOGGING"
+AWS_LAMBDA_LOG_QUEUE_SIZE = "AWS_LAMBDA_LOG_QUEUE_SIZE"
+AWS_LAMBDA_LOG_OVERFLOW = "AWS_LAMBDA_LOG_OVERFLOW"
+# Set to "true" to send stdout and stderr output as telemetry log frames, see LogSinkStream.
+AWS_LAMBDA_FRAMED_STDOUT = "AWS_LAMBDA_FRAMED_STDOUT"
 INIT_TYPE_SNAP_START = "snap-start"
 PREVIEW_RUNTIME_ENVS = {"AWS_Lambda_python3.15"}
+STREAMING_RESPONSE_CONTENT_TYPE = "application/octet-stream"
+_STREAM_READ_SIZE = 64 * 1024
+_BINARY_CHUNK_TYPES = (bytes, bytearray, memoryview)
+_RAW_RESULT_TYPES = (bytes, bytearray, memoryview, mmap.mmap, str)
+_EVENT_LOOP = None
+# A batch of log frames is written out early once it reaches either limit. Each frame takes two iovecs, and writev
+# accepts at most IOV_MAX (1024 on Linux) of them.
+_LOG_BATCH_FLUSH_BYTES = 64 * 1024
+_LOG_BATCH_MAX_FRAMES = 512
+# Held frames are written out once the oldest of them has waited this long.
+_LOG_BATCH_FLUSH_INTERVAL = 0.2
+_ASYNC_LOG_CAPACITY = 4096
+# BufferedStream writes out whole lines once this much output is pending, and everything once it has been pending this long.
+_STREAM_FLUSH_BYTES = 16 * 1024
+_STREAM_FLUSH_INTERVAL = 0.2
+_LOG_OVERFLOW_POLICIES = ("block", "drop-oldest", "drop")
+# inspect.CO_COROUTINE, checked directly to keep inspect out of the cold start.
+_CO_COROUTINE = 0x0080
 
 
 def _get_handler(handler):
@@ -74,6 +114,49 @@ def _get_handler(handler):
             None,
         )
         raise fault
+
+    raw_content_type = getattr(request_handler, RAW_PAYLOAD_ATTRIBUTE, None)
+    if _is_coroutine_function(request_handler):
+        request_handler = _wrap_async_handler(request_handler)
+    if raw_content_type is not None:
+        request_handler = _RawPayloadHandler(request_handler, raw_content_type)
+    return request_handler
+
+
+class _RawPayloadHandler(object):
+    """Handler declared with raw_payload, which handle_event_request calls without going through the marshaller."""
+
+    __slots__ = ("handler", "content_type")
+
+    def __init__(self, handler, content_type):
+        self.handler = handler
+        self.content_type = content_type
+
+    def __call__(self, event, context):
+        return self.handler(event, context)
+
+    def raw_result(self, response):
+        if response is None:
+            return b"", self.content_type
+        if not isinstance(response, _RAW_RESULT_TYPES):
+            raise FaultException(
+                FaultException.MARSHAL_ERROR,
+                "Unable to marshal response: raw payload handlers must return "
+                "bytes, a buffer or str, not {}".format(type(response).__name__),
+                None,
+            )
+        return response, self.content_type
+
+
+def _is_coroutine_function(func):
+    code = getattr(getattr(func, "__func__", func), "__code__", None)
+    return code is not None and bool(code.co_flags & _CO_COROUTINE)
+
+
+def _wrap_async_handler(async_handler):
+    def request_handler(event, context):
+        return _run_coroutine(async_handler(event, context))
+
     return request_handler
 
 
@@ -149,6 +232,112 @@ else:
         log_sink.log_error(error_message_lines)
 
 
+def _resolve_awaitable(response):
+    # Decorated coroutine functions, partials and instances with an async __call__ are not detected by
+    # _is_coroutine_function, but still return an awaitable.
+    if isinstance(response, Awaitable):
+        return _run_coroutine(response)
+    return response
+
+
+def _get_event_loop():
+    global _EVENT_LOOP
+    if _EVENT_LOOP is None:
+        import asyncio
+
+        _EVENT_LOOP = asyncio.new_event_loop()
+        asyncio.set_event_loop(_EVENT_LOOP)
+    return _EVENT_LOOP
+
+
+def _run_coroutine(awaitable):
+    try:
+        return _get_event_loop().run_until_complete(awaitable)
+    except Exception as e:
+        # Hide the event loop machinery between the runtime and the user code from the reported stack trace.
+        import asyncio
+
+        asyncio_dir = os.path.dirname(asyncio.__file__)
+        tb = e.__traceback__
+        while tb is not None and (
+            tb.tb_frame.f_code.co_filename == __file__
+            or os.path.dirname(tb.tb_frame.f_code.co_filename) == asyncio_dir
+        ):
+            tb = tb.tb_next
+        raise e.with_traceback(tb)
+
+
+def _is_streaming_response(response):
+    # Buffers such as mmap.mmap have a read method too, but are posted whole as a binary response.
+    if isinstance(response, _BINARY_RESPONSE_TYPES):
+        return False
+    return isinstance(response, (Iterator, AsyncIterator)) or callable(
+        getattr(response, "read", None)
+    )
+
+
+def _read_stream(stream):
+    try:
+        while True:
+            chunk = stream.read(_STREAM_READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+
+
+def _iterate_async(async_iterator):
+    exhausted = False
+    try:
+        while True:
+            try:
+                yield _run_coroutine(async_iterator.__anext__())
+            except StopAsyncIteration:
+                exhausted = True
+                return
+    finally:
+        aclose = getattr(async_iterator, "aclose", None)
+        if not exhausted and aclose is not None:
+            _run_coroutine(aclose())
+
+
+def _iter_stream_chunks(response):
+    # File-like objects are iterators over lines, read them in blocks instead.
+    if callable(getattr(response, "read", None)):
+        response = _read_stream(response)
+    elif isinstance(response, AsyncIterator):
+        response = _iterate_async(response)
+
+    for chunk in response:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        elif not isinstance(chunk, _BINARY_CHUNK_TYPES):
+            raise TypeError(
+                "Streaming response chunks must be bytes or str, not {}".format(
+                    type(chunk).__name__
+                )
+            )
+        yield chunk
+
+
+def _report_stream_error(invoke_id, log_sink, exc_info):
+    etype, value, tb = exc_info
+    tb_tuples = extract_traceback(tb)
+    # Drop the runtime's own frames (transport and chunk iteration) from the top of the stack.
+    runtime_dir = os.path.dirname(__file__)
+    while tb_tuples and os.path.dirname(tb_tuples[0][0]) == runtime_dir:
+        tb_tuples.pop(0)
+
+    error_result = make_error(
+        str(value), etype.__name__, traceback.format_list(tb_tuples), invoke_id
+    )
+    log_error(error_result, log_sink)
+    return error_result["errorType"], to_json(error_result)
+
+
 def handle_event_request(
     lambda_runtime_client,
     request_handler,
@@ -163,6 +352,7 @@ def handle_event_request(
     log_sink,
 ):
     error_result = None
+    stream = None
     try:
         lambda_context = create_lambda_context(
             client_context_json,
@@ -172,13 +362,30 @@ def handle_event_request(
             invoked_function_arn,
             tenant_id,
         )
-        event = lambda_runtime_client.marshaller.unmarshal_request(
-            event_body, content_type
-        )
-        response = request_handler(event, lambda_context)
-        result, result_content_type = lambda_runtime_client.marshaller.marshal_response(
-            response
-        )
+        if type(request_handler) is _RawPayloadHandler:
+            # Raw payload handlers bypass the marshaller both ways.
+            result, result_content_type = request_handler.raw_result(
+                _resolve_awaitable(request_handler(event_body, lambda_context))
+            )
+        else:
+            event = lambda_runtime_client.marshaller.unmarshal_request(
+                event_body, content_type
+            )
+            response = _resolve_awaitable(request_handler(event, lambda_context))
+            stream_content_type = STREAMING_RESPONSE_CONTENT_TYPE
+            if isinstance(response, LambdaResponse) and _is_streaming_response(
+                response.body
+            ):
+                # A streamed body wrapped in a LambdaResponse is sent with the content type it carries.
+                response, stream_content_type = response.body, response.content_type
+            if _is_streaming_response(response):
+                stream = _iter_stream_chunks(response)
+                # Errors raised before the first chunk is produced are reported as regular invocation errors.
+                first_chunk = next(stream, b"")
+            else:
+                result, result_content_type = (
+                    lambda_runtime_client.marshaller.marshal_response(response)
+                )
     except FaultException as e:
         xray_fault = make_xray_fault("LambdaValidationError", e.msg, os.getcwd(), [])
         error_result = make_error(
@@ -204,10 +411,22 @@ def handle_event_request(
     if error_result is not None:
 
         log_error(error_result, log_sink)
+        _flush_output(log_sink)
         lambda_runtime_client.post_invocation_error(
             invoke_id, to_json(error_result), to_json(xray_fault)
         )
+    elif stream is not None:
+        _flush_output(log_sink)
+        lambda_runtime_client.post_invocation_stream(
+            invoke_id,
+            itertools.chain((first_chunk,), stream),
+            stream_content_type,
+            partial(_report_stream_error, invoke_id, log_sink),
+        )
+        # The handler keeps running, and logging, while its response is streamed.
+        _flush_output(log_sink)
     else:
+        _flush_output(log_sink)
         lambda_runtime_client.post_invocation_result(
             invoke_id, result, result_content_type
         )
@@ -312,24 +531,40 @@ def on_init_complete(lambda_runtime_client, log_sink):
         sys.exit(65)
 
 
+def _encoded_size(msg):
+    # Size of the message as written out in UTF-8, without encoding the common ASCII-only case.
+    return len(msg) if msg.isascii() else len(msg.encode("utf-8"))
+
+
 class LambdaLoggerHandler(logging.Handler):
+    rate_limiter = None
+
     def __init__(self, log_sink):
         logging.Handler.__init__(self)
         self.log_sink = log_sink
 
     def emit(self, record):
+        _attach_invocation_identity(record)
         msg = self.format(record)
+        if self.rate_limiter is not None:
+            self.rate_limiter.count_bytes(_encoded_size(msg))
         self.log_sink.log(msg)
 
 
 class LambdaLoggerHandlerWithFrameType(logging.Handler):
+    rate_limiter = None
+
     def __init__(self, log_sink):
         super().__init__()
         self.log_sink = log_sink
 
     def emit(self, record):
+        _attach_invocation_identity(record)
+        msg = self.format(record)
+        if self.rate_limiter is not None:
+            self.rate_limiter.count_bytes(_encoded_size(msg))
         self.log_sink.log(
-            self.format(record),
+            msg,
             frame_type=(
                 getattr(record, "_frame_type", None)
                 or _TEXT_FRAME_TYPES.get(_format_log_level(record))
@@ -337,13 +572,47 @@ class LambdaLoggerHandlerWithFrameType(logging.Handler):
         )
 
 
+def _invocation_identity():
+    # Threads started by the handler do not inherit its context, they fall back to the invocation in progress.
+    identity = _INVOCATION_IDENTITY.get(None)
+    if identity is None:
+        return _GLOBAL_AWS_REQUEST_ID or "", _GLOBAL_TENANT_ID
+    return identity
+
+
+def _attach_invocation_identity(record):
+    # Records created before the factory was installed, or by a factory that does not chain to it, carry no identity.
+    identity = getattr(record, "_lambda_identity", None)
+    if identity is None:
+        identity = _invocation_identity()
+    record.aws_request_id, record.tenant_id = identity
+
+
 class LambdaLoggerFilter(logging.Filter):
     def filter(self, record):
-        record.aws_request_id = _GLOBAL_AWS_REQUEST_ID or ""
-        record.tenant_id = _GLOBAL_TENANT_ID
+        record.aws_request_id, record.tenant_id = _invocation_identity()
         return True
 
 
+class _LambdaLogRecordFactory(object):
+    """
+    Log record factory capturing the request and tenant id of the invocation a record is created in, so that no filter
+    pass is needed on the handler and records logged from concurrent invocations keep their own ids. They are kept in
+    a private attribute, which leaves aws_request_id and tenant_id free for `extra`, and copied onto the record when it
+    is emitted.
+    """
+
+    __slots__ = ("factory",)
+
+    def __init__(self, factory):
+        self.factory = factory
+
+    def __call__(self, *args, **kwargs):
+        record = self.factory(*args, **kwargs)
+        record._lambda_identity = _invocation_identity()
+        return record
+
+
 class Unbuffered(object):
     def __init__(self, stream):
         self.stream = stream
@@ -366,6 +635,158 @@ class Unbuffered(object):
         self.stream.flush()
 
 
+class _DelayedFlusher(object):
+    """
+    _DelayedFlusher writes out output that a stream or log sink holds back once it has been pending for `interval`
+    seconds, so that it is not lost when the handler hangs or the process dies before the next flush. A single daemon
+    thread, started on first use, waits on a condition over the owner's `lock`. The owner calls pending(), with `lock`
+    held, whenever output goes from nothing pending to pending.
+    """
+
+    def __init__(self, lock, is_pending, write_pending, interval):
+        self._ready = threading.Condition(lock)
+        self._is_pending = is_pending
+        self._write_pending = write_pending
+        self._interval = interval
+        self._thread = None
+
+    def pending(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._flush_pending, name="lambda-output-flusher", daemon=True
+            )
+            self._thread.start()
+        self._ready.notify()
+
+    def _flush_pending(self):
+        with self._ready:
+            while True:
+                self._ready.wait_for(self._is_pending)
+                deadline = time.monotonic() + self._interval
+                while self._is_pending():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._ready.wait(remaining)
+                if self._is_pending():
+                    try:
+                        self._write_pending()
+                    except Exception:
+                        # The owner's next write or flush reports a broken output, keep flushing what follows.
+                        pass
+
+
+class BufferedStream(object):
+    """
+    BufferedStream replaces Unbuffered around sys.stdout and sys.stderr. Instead of flushing the stream after every
+    write, which costs print() at least two syscalls, it coalesces writes and hands them to the stream whole lines at a
+    time once _STREAM_FLUSH_BYTES are pending. A _DelayedFlusher writes out whatever has been pending for
+    _STREAM_FLUSH_INTERVAL seconds, so output printed before a handler hangs or the process dies is not held back. The runtime flushes it before posting each response, and the interpreter flushes it on exit.
+    Setting PYTHONUNBUFFERED brings Unbuffered back.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._pending = []
+        self._pending_size = 0
+        self._lock = threading.Lock()
+        self._flusher = _DelayedFlusher(
+            self._lock,
+            lambda: self._pending,
+            self._write_pending,
+            _STREAM_FLUSH_INTERVAL,
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.flush()
+
+    def __getattr__(self, attr):
+        return getattr(self.stream, attr)
+
+    def write(self, msg):
+        with self._lock:
+            if not self._pending:
+                self._flusher.pending()
+            self._pending.append(msg)
+            self._pending_size += len(msg)
+            if self._pending_size >= _STREAM_FLUSH_BYTES:
+                self._write_pending(whole_lines=True)
+        return len(msg)
+
+    def writelines(self, msgs):
+        for msg in msgs:
+            self.write(msg)
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._write_pending()
+            else:
+                self.stream.flush()
+
+    def _write_pending(self, whole_lines=False):
+        data = "".join(self._pending)
+        rest = ""
+        if whole_lines:
+            # A partial line is held back, unless it is large enough to be written out on its own.
+            end = data.rfind("\n") + 1
+            if end and len(data) - end < _STREAM_FLUSH_BYTES:
+                data, rest = data[:end], data[end:]
+        self._pending = [rest] if rest else []
+        self._pending_size = len(rest)
+        self.stream.write(data)
+        self.stream.flush()
+
+
+class LogSinkStream(object):
+    """
+    LogSinkStream stands in for sys.stdout and sys.stderr when AWS_LAMBDA_FRAMED_STDOUT is set and logs go to the
+    telemetry log sink. Output is sent as log frames, one per run of writes ending with a newline, which is one per
+    print() call, so that multi-line output stays a single record instead of being line-scanned off the stdout pipe.
+    """
+
+    def __init__(self, log_sink, stream):
+        self.log_sink = log_sink
+        self.stream = stream
+        self._pending = []
+        self._pending_size = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attr):
+        return getattr(self.stream, attr)
+
+    def write(self, msg):
+        with self._lock:
+            self._pending.append(msg)
+            self._pending_size += len(msg)
+            if msg.endswith("\n") or self._pending_size >= _STREAM_FLUSH_BYTES:
+                self._log_pending()
+        return len(msg)
+
+    def writelines(self, msgs):
+        for msg in msgs:
+            self.write(msg)
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._log_pending()
+
+    def _log_pending(self):
+        msg = "".join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        try:
+            self.log_sink.log(msg)
+        except ValueError:
+            # The log sink has been closed, such as for a traceback printed on the way out of run().
+            self.stream.write(msg)
+            self.stream.flush()
+
+
 class StandardLogSink(object):
     def __init__(self):
         pass
@@ -379,6 +800,15 @@ class StandardLogSink(object):
     def log(self, msg, frame_type=None):
         sys.stdout.write(msg)
 
+    def _frame(self, msg, frame_type=None):
+        return msg
+
+    def _write(self, frame):
+        sys.stdout.write(frame)
+
+    def flush(self):
+        sys.stdout.flush()
+
     def log_error(self, message_lines):
         error_message = ERROR_LOG_LINE_TERMINATE.join(message_lines) + "\n"
         sys.stdout.write(error_message)
@@ -398,29 +828,90 @@ class FramedTelemetryLogSink(object):
     The first 4 bytes indicate the type of the frame - log frames have a type defined as the hex value 0xa55a0003. The
     second 4 bytes should indicate the message's length. The next 8 bytes should indicate the timestamp of the message.
     The next 'len' bytes contain the message. The byte order is big-endian.
+
+    With batching enabled, frames are held back and written together with a single writev when flush() is called,
+    which the runtime does before posting each response, as soon as the batch reaches _LOG_BATCH_FLUSH_BYTES or
+    _LOG_BATCH_MAX_FRAMES, or once its oldest frame has been held for _LOG_BATCH_FLUSH_INTERVAL. Frames keep the
+    timestamp of the log call and are written in order. Once the sink has been left, frames are no longer held and
+    writing them raises ValueError.
     """
 
-    def __init__(self, fd):
+    def __init__(self, fd, batching=False):
         self.fd = int(fd)
+        self.batching = batching
+        self._frames = []
+        self._frames_size = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._flusher = _DelayedFlusher(
+            self._lock,
+            lambda: self._frames,
+            self._write_frames,
+            _LOG_BATCH_FLUSH_INTERVAL,
+        )
 
     def __enter__(self):
         self.file = os.fdopen(self.fd, "wb", 0)
+        self._closed = False
         return self
 
     def __exit__(self, exc_type, exc_value, exc_tb):
+        with self._lock:
+            if self._frames:
+                self._write_frames()
+            self._closed = True
         self.file.close()
 
     def log(self, msg, frame_type=None):
+        self._write(self._frame(msg, frame_type))
+
+    def _frame(self, msg, frame_type=None):
         encoded_msg = msg.encode("utf8")
 
         timestamp = int(time.time_ns() / 1000)  # UNIX timestamp in microseconds
-        log_msg = (
+        header = (
             (frame_type or _DEFAULT_FRAME_TYPE)
             + len(encoded_msg).to_bytes(4, "big")
             + timestamp.to_bytes(8, "big")
-            + encoded_msg
         )
-        self.file.write(log_msg)
+        return header, encoded_msg
+
+    def _write(self, frame):
+        header, encoded_msg = frame
+        if not self.batching or self._closed:
+            self.file.write(header + encoded_msg)
+            return
+
+        with self._lock:
+            if not self._frames:
+                self._flusher.pending()
+            self._frames.append(header)
+            self._frames.append(encoded_msg)
+            self._frames_size += len(header) + len(encoded_msg)
+            if (
+                self._frames_size >= _LOG_BATCH_FLUSH_BYTES
+                or len(self._frames) >= 2 * _LOG_BATCH_MAX_FRAMES
+            ):
+                self._write_frames()
+
+    def flush(self):
+        if self._frames:
+            with self._lock:
+                self._write_frames()
+
+    def _write_frames(self):
+        frames = self._frames
+        self._frames = []
+        self._frames_size = 0
+        i = 0
+        while i < len(frames):
+            written = os.writev(self.fd, frames[i:] if i else frames)
+            while i < len(frames) and written >= len(frames[i]):
+                written -= len(frames[i])
+                i += 1
+            if written:
+                # Partial write, carry on from the middle of the frame it stopped in.
+                frames[i] = frames[i][written:]
 
     def log_error(self, message_lines):
         error_message = "\n".join(message_lines)
@@ -430,6 +921,166 @@ class FramedTelemetryLogSink(object):
         )
 
 
+class AsyncLogSink(object):
+    """
+    AsyncLogSink moves the writes of another log sink off the threads that log, so that a slow log consumer does not
+    hold up the handler. Frames are built on the logging thread, which keeps their timestamps, queued in a ring of
+    `capacity` frames and written in order by a writer thread. When the ring is full, the logging thread either waits
+    for room ("block"), evicts the oldest queued frame ("drop-oldest") or discards its own ("drop"); errors logged with
+    log_error are exempt from the policy. Dropped frames, and frames whose write failed, are counted in `dropped` and
+    reported in a log line once the ring drains. flush() waits for the ring to drain, which
+    the runtime does before posting each response, and leaving the sink drains it one last time.
+    """
+
+    def __init__(self, sink, capacity=_ASYNC_LOG_CAPACITY, overflow="block"):
+        if overflow not in _LOG_OVERFLOW_POLICIES:
+            raise ValueError("Unknown log overflow policy: {}".format(overflow))
+        self.sink = sink
+        self.capacity = capacity
+        self.overflow = overflow
+        self.dropped = 0
+        self._reported_dropped = 0
+        self._ring = collections.deque()
+        self._writing = False
+        self._running = False
+        self._closed = False
+        self._ready = threading.Condition()
+        self._thread = None
+
+    def __enter__(self):
+        self.sink.__enter__()
+        self._running = True
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._write_queued, name="lambda-log-writer", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        with self._ready:
+            self._closed = True
+            self._ready.notify_all()
+        self._thread.join()
+        self.sink.__exit__(exc_type, exc_value, exc_tb)
+
+    def log(self, msg, frame_type=None):
+        self._enqueue(self.sink._write, self.sink._frame(msg, frame_type))
+
+    def log_error(self, message_lines):
+        self._enqueue(self.sink.log_error, message_lines, droppable=False)
+
+    def flush(self):
+        with self._ready:
+            self._ready.wait_for(
+                lambda: not (self._running and (self._ring or self._writing))
+            )
+        self.sink.flush()
+
+    def _enqueue(self, write, frame, droppable=True):
+        with self._ready:
+            if not self._running:
+                # Before the sink is entered, or once it has been drained and left, frames are written directly.
+                write(frame)
+                return
+            if droppable and len(self._ring) >= self.capacity:
+                if self.overflow == "drop":
+                    self.dropped += 1
+                    return
+                if self.overflow == "drop-oldest":
+                    self._evict_oldest()
+                else:
+                    self._ready.wait_for(
+                        lambda: not self._running or len(self._ring) < self.capacity
+                    )
+                    if not self._running:
+                        write(frame)
+                        return
+            self._ring.append((write, frame))
+            self._ready.notify_all()
+
+    def _evict_oldest(self):
+        for i, (write, _) in enumerate(self._ring):
+            if write != self.sink.log_error:
+                del self._ring[i]
+                self.dropped += 1
+                return
+
+    def _write_queued(self):
+        try:
+            while True:
+                with self._ready:
+                    self._ready.wait_for(lambda: self._closed or self._ring)
+                    if not self._ring:
+                        return
+                    frames = list(self._ring)
+                    self._ring.clear()
+                    self._writing = True
+                    dropped = self.dropped - self._reported_dropped
+                    self._reported_dropped = self.dropped
+                    # Wake up logging threads waiting for room in the ring.
+                    self._ready.notify_all()
+
+                try:
+                    self._write_batch(frames, dropped)
+                finally:
+                    with self._ready:
+                        self._writing = False
+                        self._ready.notify_all()
+        finally:
+            with self._ready:
+                # Also reached if the writer thread dies, after which flush() stops waiting for it and frames are
+                # written directly.
+                self._running = False
+                self.dropped += len(self._ring)
+                self._ring.clear()
+                self._ready.notify_all()
+
+    def _write_batch(self, frames, dropped):
+        failed = 0
+        for write, frame in frames:
+            try:
+                write(frame)
+            except Exception:
+                # A failing write must neither lose the frames behind it nor stall flush().
+                failed += 1
+        if failed:
+            with self._ready:
+                self.dropped += failed
+                self._reported_dropped += failed
+            dropped += failed
+        try:
+            if dropped:
+                self.sink.log(
+                    "[WARNING]\t{} log messages were dropped, the log queue was "
+                    "full or writing them failed\n".format(dropped),
+                    frame_type=_TEXT_FRAME_TYPES[logging.WARNING],
+                )
+            self.sink.flush()
+        except Exception:
+            # The sink is broken, which the failed writes have already been counted for.
+            pass
+
+
+def _flush_output(log_sink):
+    if _LOG_RATE_LIMITER is not None:
+        _LOG_RATE_LIMITER.report()
+    # Streams first, as they may write into the log sink.
+    sys.stdout.flush()
+    sys.stderr.flush()
+    log_sink.flush()
+
+
+def _frame_output(log_sink):
+    if os.environ.get(AWS_LAMBDA_FRAMED_STDOUT, "").lower() != "true":
+        return
+    if not isinstance(getattr(log_sink, "sink", log_sink), FramedTelemetryLogSink):
+        # Without a telemetry log sink, logs are written to stdout themselves.
+        return
+    sys.stdout = LogSinkStream(log_sink, sys.stdout)
+    sys.stderr = LogSinkStream(log_sink, sys.stderr)
+
+
 def update_xray_env_variable(xray_trace_id):
     if xray_trace_id is not None:
         os.environ["_X_AMZN_TRACE_ID"] = xray_trace_id
@@ -442,14 +1093,32 @@ def create_log_sink():
     if "_LAMBDA_TELEMETRY_LOG_FD" in os.environ:
         fd = os.environ["_LAMBDA_TELEMETRY_LOG_FD"]
         del os.environ["_LAMBDA_TELEMETRY_LOG_FD"]
-        return FramedTelemetryLogSink(fd)
+        log_sink = FramedTelemetryLogSink(
+            fd, batching=os.environ.get(AWS_LAMBDA_LOG_BATCHING, "").lower() == "true"
+        )
 
     else:
-        return StandardLogSink()
+        log_sink = StandardLogSink()
+
+    if os.environ.get(AWS_LAMBDA_ASYNC_LOGGING, "").lower() == "true":
+        overflow = os.environ.get(AWS_LAMBDA_LOG_OVERFLOW, "block").lower()
+        try:
+            capacity = int(os.environ.get(AWS_LAMBDA_LOG_QUEUE_SIZE, ""))
+        except ValueError:
+            capacity = _ASYNC_LOG_CAPACITY
+        log_sink = AsyncLogSink(
+            log_sink,
+            capacity=max(capacity, 1),
+            overflow=overflow if overflow in _LOG_OVERFLOW_POLICIES else "block",
+        )
+    return log_sink
 
 
 _GLOBAL_AWS_REQUEST_ID = None
+_LOG_RATE_LIMITER = None
 _GLOBAL_TENANT_ID = None
+# (request id, tenant id) of the invocation running in the current context.
+_INVOCATION_IDENTITY = contextvars.ContextVar("lambda_invocation_identity")
 
 
 def _setup_logging(log_format, log_level, log_sink):
@@ -464,17 +1133,20 @@ def _setup_logging(log_format, log_level, log_sink):
     if log_format == LogFormat.JSON:
         logger_handler.setFormatter(JsonFormatter())
     else:
-        logger_handler.setFormatter(
-            logging.Formatter(
-                "[%(levelname)s]\t%(asctime)s.%(msecs)03dZ\t%(aws_request_id)s\t%(message)s\n",
-                "%Y-%m-%dT%H:%M:%S",
-            )
-        )
+        logger_handler.setFormatter(TextFormatter())
 
     if log_level in logging._nameToLevel:
         logger.setLevel(log_level)
 
-    logger_handler.addFilter(LambdaLoggerFilter())
+    global _LOG_RATE_LIMITER
+    _LOG_RATE_LIMITER = LogRateLimiter.from_env(os.environ)
+    if _LOG_RATE_LIMITER is not None:
+        # Added first, so that suppressed records are dropped before anything else is done with them.
+        _LOG_RATE_LIMITER.attach(logger_handler)
+
+    record_factory = logging.getLogRecordFactory()
+    if not isinstance(record_factory, _LambdaLogRecordFactory):
+        logging.setLogRecordFactory(_LambdaLogRecordFactory(record_factory))
     logger.addHandler(logger_handler)
 
 
@@ -491,10 +1163,12 @@ def _log_preview_runtime_warning():
 
 
 def run(handler, lambda_runtime_client):
-    sys.stdout = Unbuffered(sys.stdout)
-    sys.stderr = Unbuffered(sys.stderr)
+    stream_type = Unbuffered if os.environ.get("PYTHONUNBUFFERED") else BufferedStream
+    sys.stdout = stream_type(sys.stdout)
+    sys.stderr = stream_type(sys.stderr)
 
     with create_log_sink() as log_sink:
+        _frame_output(log_sink)
         error_result = None
 
         try:
@@ -518,22 +1192,40 @@ def run(handler, lambda_runtime_client):
 
             logging.warning(lambda_unhandled_exception_warning_message)
             log_error(error_result, log_sink)
+            _flush_output(log_sink)
             lambda_runtime_client.post_init_error(error_result)
 
             sys.exit(1)
 
+        # Logs from the init phase must be out before the sandbox is frozen waiting for an invocation.
+        _flush_output(log_sink)
         if os.environ.get(AWS_LAMBDA_INITIALIZATION_TYPE) == INIT_TYPE_SNAP_START:
             on_init_complete(lambda_runtime_client, log_sink)
 
         while True:
-            event_request = lambda_runtime_client.wait_next_invocation()
+            if _EVENT_LOOP is None:
+                event_request = lambda_runtime_client.wait_next_invocation()
+            else:
+                # Keep the loop running while waiting, so background tasks make progress between invocations.
+                event_request = _EVENT_LOOP.run_until_complete(
+                    lambda_runtime_client.wait_next_invocation_async()
+                )
 
             _GLOBAL_AWS_REQUEST_ID = event_request.invoke_id
             _GLOBAL_TENANT_ID = event_request.tenant_id
+            if _LOG_RATE_LIMITER is not None:
+                _LOG_RATE_LIMITER.start_invocation(event_request.invoke_id)
 
             update_xray_env_variable(event_request.x_amzn_trace_id)
 
-            handle_event_request(
+            # Each invocation runs in a context of its own, so that the identity set in it does not outlive it.
+            invocation_context = contextvars.copy_context()
+            invocation_context.run(
+                _INVOCATION_IDENTITY.set,
+                (event_request.invoke_id or "", event_request.tenant_id),
+            )
+            invocation_context.run(
+                handle_event_request,
                 lambda_runtime_client,
                 request_handler,
                 event_request.invoke_id,
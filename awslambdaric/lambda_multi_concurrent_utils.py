@@ -29,7 +29,9 @@ class MultiConcurrentRunner:
     ):
         if socket_path:
             cls._redirect_output(socket_path)
-        client = LambdaMultiConcurrentRuntimeClient(api_addr, use_thread)
+        client = LambdaMultiConcurrentRuntimeClient(
+            api_addr, use_thread, defer_result_posts=True
+        )
         bootstrap.run(handler, client)
 
     @classmethod
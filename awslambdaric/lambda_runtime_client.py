@@ -2,7 +2,9 @@
 Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
 """
 
+import os
 import sys
+from collections import namedtuple
 from awslambdaric import __version__
 from .lambda_runtime_exception import FaultException
 from .lambda_runtime_marshaller import to_json
@@ -10,6 +12,8 @@ import logging
 import time
 
 ERROR_TYPE_HEADER = "Lambda-Runtime-Function-Error-Type"
+# Set to "python" to use the pure-Python Runtime API transport instead of the native extension
+RUNTIME_CLIENT_TRANSPORT_ENV = "AWS_LAMBDA_RUNTIME_CLIENT_TRANSPORT"
 # Retry config constants
 DEFAULT_RETRY_MAX_ATTEMPTS = 5
 DEFAULT_RETRY_INITIAL_DELAY = 0.1  # seconds
@@ -24,22 +28,40 @@ def _user_agent():
     return f"aws-lambda-python/{py_version}-{pkg_version}"
 
 
-try:
-    import runtime_client
+def _load_runtime_client():
+    if os.environ.get(RUNTIME_CLIENT_TRANSPORT_ENV, "").lower() != "python":
+        try:
+            import runtime_client
 
-    runtime_client.initialize_client(_user_agent())
-except ImportError:
-    runtime_client = None
+            return runtime_client
+        except ImportError:
+            pass
 
-from .lambda_runtime_marshaller import LambdaMarshaller
+    from . import lambda_runtime_socket_client
+
+    return lambda_runtime_socket_client
 
 
-class InvocationRequest(object):
-    def __init__(self, **kwds):
-        self.__dict__.update(kwds)
+runtime_client = _load_runtime_client()
+runtime_client.initialize_client(_user_agent())
+
+from .lambda_runtime_marshaller import LambdaMarshaller
 
-    def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+# Same fields, in the same order, as the InvocationRequest returned by runtime_client.next().
+InvocationRequest = namedtuple(
+    "InvocationRequest",
+    [
+        "invoke_id",
+        "x_amzn_trace_id",
+        "invoked_function_arn",
+        "deadline_time_in_ms",
+        "client_context",
+        "cognito_identity",
+        "tenant_id",
+        "content_type",
+        "event_body",
+    ],
+)
 
 
 class LambdaRuntimeClientError(Exception):
@@ -52,6 +74,153 @@ class LambdaRuntimeClientError(Exception):
         )
 
 
+RapidCallTiming = namedtuple(
+    "RapidCallTiming", ["http_method", "endpoint", "status", "reused", "duration_ms"]
+)
+
+
+class RapidConnection(object):
+    """Keep-alive HTTP connection to the Runtime API used for the control-plane calls (init error, restore next and
+    restore error). The connection is opened lazily, reused across calls and transparently re-established once if a
+    reused connection turns out to be stale. The timing of the most recent call is kept in `last_call_timing`.
+    """
+
+    def __init__(self, lambda_runtime_address):
+        self.lambda_runtime_address = lambda_runtime_address
+        self.last_call_timing = None
+        self._connection = None
+
+    def _connect(self):
+        # These imports are heavy-weight. They implicitly trigger `import ssl, hashlib`.
+        # Importing them lazily to speed up critical path of a common case.
+        import http.client
+
+        connection = http.client.HTTPConnection(self.lambda_runtime_address)
+        connection.connect()
+        return connection
+
+    def _request_once(self, http_method, endpoint, body, headers):
+        if self._connection is None:
+            self._connection = self._connect()
+
+        if http_method == "GET":
+            self._connection.request(http_method, endpoint)
+        else:
+            self._connection.request(http_method, endpoint, body, headers=headers)
+
+        response = self._connection.getresponse()
+        response_body = response.read()
+        if response.will_close:
+            self.close()
+        return response.code, response_body
+
+    def request(self, http_method, endpoint, body=None, headers=None):
+        import http.client
+
+        start_ns = time.monotonic_ns()
+        reused = self._connection is not None
+        try:
+            status, response_body = self._request_once(
+                http_method, endpoint, body, headers
+            )
+        except (ConnectionError, http.client.HTTPException):
+            self.close()
+            if not reused:
+                raise
+            # RAPID may have dropped the idle keep-alive connection, retry once on a fresh one.
+            reused = False
+            try:
+                status, response_body = self._request_once(
+                    http_method, endpoint, body, headers
+                )
+            except Exception:
+                self.close()
+                raise
+
+        self.last_call_timing = RapidCallTiming(
+            http_method,
+            endpoint,
+            status,
+            reused,
+            (time.monotonic_ns() - start_ns) / 1e6,
+        )
+        return status, response_body
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class NextInvocationPoller(object):
+    """Long-lived daemon thread that polls for the next invocation on behalf of the calling thread. The caller blocks
+    on a queue, which, unlike a blocking native call, can be interrupted by signal handlers. Requests and results are
+    handed over through two SimpleQueues, so each invocation costs two queue operations instead of a thread
+    creation and join."""
+
+    def __init__(self, get_next):
+        import queue
+        import threading
+
+        self._get_next = get_next
+        self._requests = queue.SimpleQueue()
+        self._results = queue.SimpleQueue()
+        # Set while a request is in flight, e.g. when the caller was interrupted by a signal while waiting for it.
+        self._pending = False
+        # Same for next_async, whose future outlives a wait interrupted by a signal.
+        self._future = None
+        self._thread = threading.Thread(
+            target=self._run, name="LambdaNextInvocationPoller", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            # None is a request from next(), anything else is a callback from next_async().
+            deliver = self._requests.get()
+            try:
+                outcome = (self._get_next(), None)
+            except Exception as e:
+                outcome = (None, e)
+            if deliver is None:
+                self._results.put(outcome)
+            else:
+                deliver(outcome)
+
+    def next(self):
+        if not self._pending:
+            self._requests.put(None)
+            self._pending = True
+        result, error = self._results.get()
+        self._pending = False
+        if error is not None:
+            raise error
+        return result
+
+    async def next_async(self):
+        """Waits for the next invocation without blocking the running event loop."""
+        import asyncio
+
+        if self._future is None:
+            loop = asyncio.get_running_loop()
+            future = self._future = loop.create_future()
+            self._requests.put(
+                lambda outcome: loop.call_soon_threadsafe(
+                    _set_future_result, future, outcome
+                )
+            )
+        result, error = await self._future
+        self._future = None
+        if error is not None:
+            raise error
+        return result
+
+
+def _set_future_result(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
 class BaseLambdaRuntimeClient(object):
     marshaller = LambdaMarshaller()
     """marshaller is a class attribute that determines the unmarshalling and marshalling logic of a function's event
@@ -62,36 +231,29 @@ class BaseLambdaRuntimeClient(object):
         self,
         lambda_runtime_address,
         use_thread_for_polling_next=False,
+        defer_result_posts=False,
     ):
         self.lambda_runtime_address = lambda_runtime_address
+        self.rapid_connection = RapidConnection(lambda_runtime_address)
         self.use_thread_for_polling_next = use_thread_for_polling_next
-        if self.use_thread_for_polling_next:
-            # Conditionally import only for the case when TPE is used in this class.
-            from concurrent.futures import ThreadPoolExecutor
-
-            # Not defining symbol as global to avoid relying on TPE being imported unconditionally.
-            self.ThreadPoolExecutor = ThreadPoolExecutor
+        # When set, post_invocation_result only records the result, which the next wait_next_invocation posts in the
+        # same runtime_client.post_and_next call that fetches the next invocation.
+        self.defer_result_posts = defer_result_posts
+        self._pending_result = None
+        # Started on first use, so that the thread is created in the process that actually polls.
+        self._next_invocation_poller = None
+        # The native client cannot stream responses, streamed responses go through their own connection.
+        self._streaming_connection = None
 
     def call_rapid(
         self, http_method, endpoint, expected_http_code, payload=None, headers=None
     ):
-        # These imports are heavy-weight. They implicitly trigger `import ssl, hashlib`.
-        # Importing them lazily to speed up critical path of a common case.
-        import http.client
-
-        runtime_connection = http.client.HTTPConnection(self.lambda_runtime_address)
-        runtime_connection.connect()
-        if http_method == "GET":
-            runtime_connection.request(http_method, endpoint)
-        else:
-            runtime_connection.request(
-                http_method, endpoint, to_json(payload), headers=headers
-            )
-
-        response = runtime_connection.getresponse()
-        response_body = response.read()
-        if response.code != expected_http_code:
-            raise LambdaRuntimeClientError(endpoint, response.code, response_body)
+        body = None if http_method == "GET" else to_json(payload)
+        response_code, response_body = self.rapid_connection.request(
+            http_method, endpoint, body, headers
+        )
+        if response_code != expected_http_code:
+            raise LambdaRuntimeClientError(endpoint, response_code, response_body)
 
     def post_init_error(self, error_response_data, error_type_override=None):
         import http
@@ -119,7 +281,11 @@ class BaseLambdaRuntimeClient(object):
         import http
 
         endpoint = "/2018-06-01/runtime/restore/next"
-        self.call_rapid("GET", endpoint, http.HTTPStatus.OK)
+        try:
+            self.call_rapid("GET", endpoint, http.HTTPStatus.OK)
+        finally:
+            # Sockets opened before the snapshot do not survive the restore.
+            self.rapid_connection.close()
 
     def report_restore_error(self, restore_error_data):
         import http
@@ -135,20 +301,30 @@ class BaseLambdaRuntimeClient(object):
         raise NotImplementedError
 
     def _get_next(self):
+        pending_result, self._pending_result = self._pending_result, None
         try:
+            if pending_result is not None:
+                return self._post_and_next(*pending_result)
             return runtime_client.next()
         except Exception as e:
             return self.handle_exception(e, runtime_client.next, True)
 
+    def _post_and_next(self, invoke_id, result_data, content_type):
+        try:
+            return runtime_client.post_and_next(invoke_id, result_data, content_type)
+        except runtime_client.PostError as e:
+            # The next invocation is only requested once the result has been posted.
+            self.handle_exception(e)
+            return runtime_client.next()
+
     def wait_next_invocation(self):
         # Calling runtime_client.next() from a separate thread unblocks the main thread,
         # which can then process signals.
         if self.use_thread_for_polling_next:
             try:
-                # TPE class is supposed to be registered at construction time and be ready to use.
-                with self.ThreadPoolExecutor(max_workers=1) as executor:
-                    future = executor.submit(self._get_next)
-                response_body, headers = future.result()
+                if self._next_invocation_poller is None:
+                    self._next_invocation_poller = NextInvocationPoller(self._get_next)
+                response = self._next_invocation_poller.next()
             except Exception as e:
                 raise FaultException(
                     FaultException.LAMBDA_RUNTIME_CLIENT_ERROR,
@@ -156,31 +332,60 @@ class BaseLambdaRuntimeClient(object):
                     None,
                 )
         else:
-            response_body, headers = runtime_client.next()
-        return InvocationRequest(
-            invoke_id=headers.get("Lambda-Runtime-Aws-Request-Id"),
-            x_amzn_trace_id=headers.get("Lambda-Runtime-Trace-Id"),
-            invoked_function_arn=headers.get("Lambda-Runtime-Invoked-Function-Arn"),
-            deadline_time_in_ms=headers.get("Lambda-Runtime-Deadline-Ms"),
-            client_context=headers.get("Lambda-Runtime-Client-Context"),
-            cognito_identity=headers.get("Lambda-Runtime-Cognito-Identity"),
-            tenant_id=headers.get("Lambda-Runtime-Aws-Tenant-Id"),
-            content_type=headers.get("Content-Type"),
-            event_body=response_body,
-        )
+            pending_result, self._pending_result = self._pending_result, None
+            if pending_result is None:
+                response = runtime_client.next()
+            else:
+                response = self._post_and_next(*pending_result)
+        return self._invocation_request(response)
+
+    async def wait_next_invocation_async(self):
+        """Like wait_next_invocation, but lets the running event loop make progress while waiting."""
+        try:
+            if self._next_invocation_poller is None:
+                self._next_invocation_poller = NextInvocationPoller(self._get_next)
+            response = await self._next_invocation_poller.next_async()
+        except Exception as e:
+            raise FaultException(
+                FaultException.LAMBDA_RUNTIME_CLIENT_ERROR,
+                "LAMBDA_RUNTIME Failed to get next invocation: {}".format(str(e)),
+                None,
+            )
+        return self._invocation_request(response)
+
+    def _invocation_request(self, response):
+        if (
+            isinstance(response.event_body, memoryview)
+            and type(self.marshaller).unmarshal_request
+            is not LambdaMarshaller.unmarshal_request
+        ):
+            # Custom marshallers predate the zero-copy payload and expect bytes.
+            response = InvocationRequest(*response[:-1], bytes(response.event_body))
+        return response
 
     def post_invocation_result(
         self, invoke_id, result_data, content_type="application/json"
     ):
+        # str results are handed over as they are, the runtime clients read their UTF-8 representation in place
+        # instead of having them encoded into a full-size bytes copy first.
+        if self.defer_result_posts and hasattr(runtime_client, "post_and_next"):
+            self._pending_result = (invoke_id, result_data, content_type)
+            return
+        try:
+            runtime_client.post_invocation_result(invoke_id, result_data, content_type)
+        except Exception as e:
+            self.handle_exception(e)
+
+    def post_invocation_stream(self, invoke_id, chunks, content_type, on_error):
         try:
-            runtime_client.post_invocation_result(
-                invoke_id,
-                (
-                    result_data
-                    if isinstance(result_data, bytes)
-                    else result_data.encode("utf-8")
-                ),
-                content_type,
+            if self._streaming_connection is None:
+                from .lambda_runtime_socket_client import RuntimeApiConnection
+
+                self._streaming_connection = RuntimeApiConnection(
+                    self.lambda_runtime_address, _user_agent()
+                )
+            self._streaming_connection.post_invocation_stream(
+                invoke_id, chunks, content_type, on_error
             )
         except Exception as e:
             self.handle_exception(e)
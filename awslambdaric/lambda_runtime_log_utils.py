@@ -4,10 +4,14 @@ Copyright 2023 Amazon.com, Inc. or its affiliates. All Rights Reserved.
 
 import json
 import logging
+import time
 import traceback
 from enum import IntEnum
 
 _DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+_TEXT_DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+# Same line as logging.Formatter("[%(levelname)s]\t%(asctime)s.%(msecs)03dZ\t%(aws_request_id)s\t%(message)s\n").
+_TEXT_LOG_LINE = "[%s]\t%s.%03dZ\t%s\t%s\n"
 _RESERVED_FIELDS = {
     "name",
     "msg",
@@ -32,7 +36,24 @@ _RESERVED_FIELDS = {
     "aws_request_id",
     "tenant_id",
     "_frame_type",
+    "_lambda_identity",
 }
+# Attributes every record has. LogRecord sets taskName since Python 3.12, which is None outside of asyncio tasks.
+_RECORD_FIELDS = frozenset(_RESERVED_FIELDS | {"taskName"})
+# Keys of the JSON log line that record attributes cannot override.
+_JSON_FIELDS = frozenset(
+    {
+        "timestamp",
+        "level",
+        "message",
+        "logger",
+        "stackTrace",
+        "errorType",
+        "errorMessage",
+        "requestId",
+        "location",
+    }
+)
 
 
 class LogFormat(IntEnum):
@@ -76,64 +97,208 @@ def _format_log_level(record: logging.LogRecord) -> int:
     return min(50, max(0, record.levelno)) // 10 * 10
 
 
-class JsonFormatter(logging.Formatter):
-    def __init__(self):
-        super().__init__(datefmt=_DATETIME_FORMAT)
+class _CachedTimestampFormatter(logging.Formatter):
+    """Formatter whose datefmt has second resolution, which formats the timestamp once per second."""
 
-    @staticmethod
-    def __format_stacktrace(exc_info):
-        if not exc_info:
-            return None
-        return traceback.format_tb(exc_info[2])
+    def __init__(self, datefmt):
+        super().__init__(datefmt=datefmt)
+        # (second, converter, formatted timestamp) of the last record.
+        self._timestamp_cache = (None, None, None)
 
-    @staticmethod
-    def __format_exception_name(exc_info):
-        if not exc_info:
-            return None
+    def _timestamp(self, record: logging.LogRecord) -> str:
+        second, converter, timestamp = self._timestamp_cache
+        if second != int(record.created) or converter is not self.converter:
+            timestamp = self.formatTime(record, self.datefmt)
+            self._timestamp_cache = (int(record.created), self.converter, timestamp)
+        return timestamp
 
-        return exc_info[0].__name__
-
-    @staticmethod
-    def __format_exception(exc_info):
-        if not exc_info:
-            return None
 
-        return str(exc_info[1])
-
-    @staticmethod
-    def __format_location(record: logging.LogRecord):
-        if not record.exc_info:
-            return None
-
-        return f"{record.pathname}:{record.funcName}:{record.lineno}"
+class JsonFormatter(_CachedTimestampFormatter):
+    def __init__(self):
+        super().__init__(_DATETIME_FORMAT)
 
     def format(self, record: logging.LogRecord) -> str:
-        record.levelno = _format_log_level(record)
-        record.levelname = logging.getLevelName(record.levelno)
+        record.levelno = levelno = _format_log_level(record)
+        record.levelname = levelname = logging.getLevelName(levelno)
         record._frame_type = _JSON_FRAME_TYPES.get(
-            record.levelno, _JSON_FRAME_TYPES[logging.NOTSET]
+            levelno, _JSON_FRAME_TYPES[logging.NOTSET]
         )
 
+        # Fields that would be None are left out rather than dropped afterwards.
         result = {
-            "timestamp": self.formatTime(record, self.datefmt),
-            "level": record.levelname,
+            "timestamp": self._timestamp(record),
+            "level": levelname,
             "message": record.getMessage(),
             "logger": record.name,
-            "stackTrace": self.__format_stacktrace(record.exc_info),
-            "errorType": self.__format_exception_name(record.exc_info),
-            "errorMessage": self.__format_exception(record.exc_info),
-            "requestId": getattr(record, "aws_request_id", None),
-            "location": self.__format_location(record),
         }
-        if hasattr(record, "tenant_id") and record.tenant_id is not None:
-            result["tenantId"] = record.tenant_id
+        exc_info = record.exc_info
+        if exc_info:
+            result["stackTrace"] = traceback.format_tb(exc_info[2])
+            result["errorType"] = exc_info[0].__name__
+            result["errorMessage"] = str(exc_info[1])
+        request_id = getattr(record, "aws_request_id", None)
+        if request_id is not None:
+            result["requestId"] = request_id
+        if exc_info:
+            result["location"] = f"{record.pathname}:{record.funcName}:{record.lineno}"
+        tenant_id = getattr(record, "tenant_id", None)
+        if tenant_id is not None:
+            result["tenantId"] = tenant_id
 
-        result.update(
-            (key, value)
-            for key, value in record.__dict__.items()
-            if key not in _RESERVED_FIELDS and key not in result
+        # Most records carry no extra attributes, which a single set difference tells.
+        if (
+            record.__dict__.keys() - _RECORD_FIELDS
+            or getattr(record, "taskName", None) is not None
+        ):
+            result.update(
+                (key, value)
+                for key, value in record.__dict__.items()
+                if value is not None
+                and key not in _RESERVED_FIELDS
+                and key not in _JSON_FIELDS
+                and key not in result
+            )
+
+        return _encode_json(result) + "\n"
+
+
+class TextFormatter(_CachedTimestampFormatter):
+    """
+    TextFormatter formats the log lines of the TEXT log format, the same way as a logging.Formatter with the
+    "[%(levelname)s]\t%(asctime)s.%(msecs)03dZ\t%(aws_request_id)s\t%(message)s\n" format would, but caches the
+    timestamp for the current second and fills a positional template instead of interpolating the record's __dict__.
+    """
+
+    def __init__(self):
+        super().__init__(_TEXT_DATETIME_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        timestamp = self._timestamp(record)
+        record.message = message = record.getMessage()
+        record.asctime = timestamp
+        line = _TEXT_LOG_LINE % (
+            record.levelname,
+            timestamp,
+            record.msecs,
+            getattr(record, "aws_request_id", ""),
+            message,
         )
 
-        result = {k: v for k, v in result.items() if v is not None}
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line += record.exc_text
+        if record.stack_info:
+            if line[-1:] != "\n":
+                line += "\n"
+            line += self.formatStack(record.stack_info)
+        return line
 
-        return _encode_json(result) + "\n"
+
+def _non_negative_int(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_sampling(value):
+    # "DEBUG=0.01,INFO=0.5": the share of records of each level that are kept. Invalid entries are ignored.
+    sampling = {}
+    for entry in (value or "").split(","):
+        name, _, ratio = entry.partition("=")
+        levelno = logging._nameToLevel.get(
+            _get_log_level_from_env_var(name.strip().upper())
+        )
+        try:
+            ratio = float(ratio)
+        except ValueError:
+            continue
+        if levelno is not None and 0 <= ratio <= 1:
+            sampling[levelno] = ratio
+    return sampling
+
+
+class LogRateLimiter(logging.Filter):
+    """
+    LogRateLimiter limits the logs an invocation writes through the Lambda log handler, deciding on each record before
+    it is formatted. Past `burst` records, records of the levels in `sampling` are only kept in the given ratio, and
+    past `max_records` records or `max_bytes` bytes of formatted output every record is suppressed. Suppressed records
+    are counted and reported in a single warning for the request id by report().
+    """
+
+    def __init__(self, max_records=None, max_bytes=None, sampling=None, burst=0):
+        super().__init__()
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.sampling = sampling or {}
+        self.burst = burst
+        self.handler = None
+        self.start_invocation(None)
+
+    @classmethod
+    def from_env(cls, environ):
+        """Returns the LogRateLimiter configured by the AWS_LAMBDA_LOG_* variables, or None if none is set."""
+        max_records = _non_negative_int(environ.get("AWS_LAMBDA_LOG_MAX_RECORDS"))
+        max_bytes = _non_negative_int(environ.get("AWS_LAMBDA_LOG_MAX_BYTES"))
+        sampling = _parse_sampling(environ.get("AWS_LAMBDA_LOG_SAMPLING"))
+        if max_records is None and max_bytes is None and not sampling:
+            return None
+        return cls(
+            max_records,
+            max_bytes,
+            sampling,
+            _non_negative_int(environ.get("AWS_LAMBDA_LOG_BURST")) or 0,
+        )
+
+    def attach(self, handler):
+        self.handler = handler
+        handler.rate_limiter = self
+        handler.addFilter(self)
+
+    def start_invocation(self, request_id):
+        self.request_id = request_id
+        self.records = 0
+        self.bytes = 0
+        self.suppressed = 0
+        self._sampled = dict.fromkeys(self.sampling, 0)
+
+    def count_bytes(self, size):
+        self.bytes += size
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if (self.max_records is not None and self.records >= self.max_records) or (
+            self.max_bytes is not None and self.bytes >= self.max_bytes
+        ):
+            self.suppressed += 1
+            return False
+        if self.records >= self.burst and self.sampling:
+            levelno = _format_log_level(record)
+            ratio = self.sampling.get(levelno)
+            if ratio is not None:
+                # Keeps evenly spread records rather than random ones, so that sampling is reproducible.
+                seen = self._sampled[levelno] = self._sampled[levelno] + 1
+                if int(seen * ratio) == int((seen - 1) * ratio):
+                    self.suppressed += 1
+                    return False
+        self.records += 1
+        return True
+
+    def report(self):
+        if not self.suppressed or self.handler is None:
+            return
+        record = logging.LogRecord(
+            "awslambdaric",
+            logging.WARNING,
+            __file__,
+            0,
+            "%d log records were suppressed by the log rate limit",
+            (self.suppressed,),
+            None,
+        )
+        record._lambda_identity = (self.request_id or "", None)
+        record.suppressedRecords = self.suppressed
+        self.suppressed = 0
+        # Emitted directly, as going through the handler's filters would suppress the report itself.
+        with self.handler.lock:
+            self.handler.emit(record)
@@ -2,50 +2,389 @@
 Copyright 2018 Amazon.com, Inc. or its affiliates. All Rights Reserved.
 """
 
+import base64
 import decimal
 import math
+import mmap
 import os
+from collections import namedtuple
+from collections.abc import Mapping
+from urllib.parse import parse_qs, urlencode
+
 import simplejson as json
 
 from .lambda_runtime_exception import FaultException
 
+# Binary responses are posted as they are, without being copied into bytes first.
+_BINARY_RESPONSE_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
+
+
+# Runtimes on which the encoded json contains unicode characters instead of unicode escape sequences.
+_ENSURE_ASCII_FALSE_EXECUTION_ENVS = {
+    "AWS_Lambda_python3.12",
+    "AWS_Lambda_python3.13",
+    "AWS_Lambda_python3.14",
+    "AWS_Lambda_python3.15",
+}
+
+
+def _ensure_ascii():
+    return os.environ.get("AWS_EXECUTION_ENV") not in _ENSURE_ASCII_FALSE_EXECUTION_ENVS
+
+
+def _encodes_decimal_nan():
+    encoder = json.JSONEncoder(use_decimal=True, allow_nan=True)
+    try:
+        nans = encoder.encode([decimal.Decimal("-NaN"), decimal.Decimal("sNaN")])
+    except Exception:
+        return False
+    return nans == "[NaN, NaN]"
 
-# simplejson's Decimal encoding allows '-NaN' as an output, which is a parse error for json.loads
-# to get the good parts of Decimal support, we'll special-case NaN decimals and otherwise duplicate the encoding for decimals the same way simplejson does
+
+# Recent simplejson releases encode Decimals natively, in their C speedups, without calling back into default() for
+# each one, which dominates the cost of marshalling DynamoDB items. Older ones write Decimal('-NaN') out as -NaN,
+# which is a parse error for json.loads, and are left to the special-casing in Encoder.default.
+_NATIVE_DECIMALS = _encodes_decimal_nan()
+
+
+# We special-case NaN decimals and otherwise duplicate the encoding for decimals the same way simplejson does
 # We also set 'ensure_ascii=False' so that the encoded json contains unicode characters instead of unicode escape sequences
 class Encoder(json.JSONEncoder):
-    def __init__(self):
-        if os.environ.get("AWS_EXECUTION_ENV") in {
-            "AWS_Lambda_python3.12",
-            "AWS_Lambda_python3.13",
-            "AWS_Lambda_python3.14",
-            "AWS_Lambda_python3.15",
-        }:
-            super().__init__(use_decimal=False, ensure_ascii=False, allow_nan=True)
-        else:
-            super().__init__(use_decimal=False, allow_nan=True)
+    def __init__(self, ensure_ascii=None):
+        if ensure_ascii is None:
+            ensure_ascii = _ensure_ascii()
+        super().__init__(
+            use_decimal=_NATIVE_DECIMALS, ensure_ascii=ensure_ascii, allow_nan=True
+        )
 
     def default(self, obj):
         if isinstance(obj, decimal.Decimal):
             if obj.is_nan():
                 return math.nan
             return json.raw_json.RawJSON(str(obj))
+        if isinstance(obj, LazyEvent):
+            return obj._for_json()
         return super().default(obj)
 
 
+# Encoders are stateless between calls, so one of each flavour is built up front and shared by the whole process.
+_ENCODERS = {ensure_ascii: Encoder(ensure_ascii) for ensure_ascii in (True, False)}
+_encoder = None
+
+
+def _select_encoder():
+    global _encoder
+    _encoder = _ENCODERS[_ensure_ascii()]
+    return _encoder
+
+
+_select_encoder()
+
+
 def to_json(obj):
-    return Encoder().encode(obj)
+    return _encoder.encode(obj)
+
+
+# Selects the library used to decode JSON events: "simplejson", "json" (the standard library), "orjson", or "auto" to
+# use the fastest one available. Encoding always goes through Encoder, which gives Decimal and NaN their semantics.
+JSON_ENGINE_ENV = "AWS_LAMBDA_JSON_ENGINE"
+
+
+def _simplejson_loads(request):
+    if isinstance(request, memoryview):
+        # Decode straight from the native buffer instead of copying it into bytes first.
+        request = str(request, "utf-8")
+    return json.loads(request)
+
+
+def _reject_constant(name):
+    # simplejson rejects NaN and Infinity when decoding, unlike the standard library.
+    raise ValueError("Unsupported constant " + name)
+
+
+def _stdlib_json_loads():
+    import json as stdlib_json
+
+    if stdlib_json.scanner.c_make_scanner is None:
+        # Without its C accelerator the standard library is slower than simplejson.
+        return None
+    decode = stdlib_json.JSONDecoder(parse_constant=_reject_constant).decode
+
+    def loads(request):
+        if not isinstance(request, str):
+            request = str(request, "utf-8")
+        try:
+            return decode(request)
+        except ValueError:
+            # Let simplejson decide what it accepts, and word the error, exactly as before.
+            return _simplejson_loads(request)
+
+    return loads
+
+
+def _orjson_loads():
+    try:
+        import orjson
+    except ImportError:
+        return None
+    orjson_loads, decode_error = orjson.loads, orjson.JSONDecodeError
+
+    def loads(request):
+        try:
+            # orjson reads bytes and memoryviews directly, without decoding them into a str first.
+            return orjson_loads(request)
+        except decode_error:
+            # Depending on the version, integers beyond 64 bits are rejected (or lose precision, see the probe).
+            return _simplejson_loads(request)
+
+    return loads
+
+
+_JSON_ENGINES = {
+    "simplejson": lambda: _simplejson_loads,
+    "json": _stdlib_json_loads,
+    "orjson": _orjson_loads,
+}
+_AUTO_JSON_ENGINES = ("orjson", "json", "simplejson")
+# Decoded once at startup by every engine other than simplejson, which is only used if it gets the same results.
+# Each document is checked on its own, so that falling back to simplejson on one cannot hide a difference in another.
+_JSON_ENGINE_PROBES = (
+    b"123456789012345678901",
+    b"-9223372036854775809",
+    b"[0.1, 1e-7, 1e400]",
+    b'"\\ud83d\\ude00"',
+)
+_json_engine = None
+_json_loads = None
+
+
+def _passes_probe(loads):
+    try:
+        # Compared through repr, which unlike == tells an int from a float of the same value.
+        return all(
+            repr(loads(probe)) == repr(json.loads(probe))
+            for probe in _JSON_ENGINE_PROBES
+        )
+    except Exception:
+        return False
+
+
+def _select_json_engine():
+    global _json_engine, _json_loads
+    requested = os.environ.get(JSON_ENGINE_ENV, "auto").lower()
+    if requested in _JSON_ENGINES:
+        candidates = (requested, "simplejson")
+    else:
+        candidates = _AUTO_JSON_ENGINES
+    for name in candidates:
+        loads = _JSON_ENGINES[name]()
+        if loads is not None and (name == "simplejson" or _passes_probe(loads)):
+            _json_engine, _json_loads = name, loads
+            return name
+
+
+_select_json_engine()
+
+
+# Handler attribute holding the content type of the response of a raw payload handler, see raw_payload.
+RAW_PAYLOAD_ATTRIBUTE = "lambda_raw_payload_content_type"
+
+
+def raw_payload(content_type="application/octet-stream"):
+    """
+    Declares a handler that bypasses the marshaller both ways: it is called with the event payload exactly as
+    received (a bytes-like object), and returns the response payload as bytes, a buffer or a str, which is posted
+    as it is with the given content type.
+
+        @raw_payload("application/json")
+        def handler(payload, context):
+            return payload
+    """
+    if callable(content_type):
+        # Used as @raw_payload, without arguments.
+        return raw_payload()(content_type)
+
+    def decorator(handler):
+        setattr(handler, RAW_PAYLOAD_ATTRIBUTE, content_type)
+        return handler
+
+    return decorator
+
+
+def _unmarshal_json(request):
+    try:
+        return _json_loads(request)
+    except Exception as e:
+        raise FaultException(
+            FaultException.UNMARSHAL_ERROR,
+            "Unable to unmarshal input: {}".format(str(e)),
+            None,
+        )
+
+
+# Set to "true" to hand JSON object events to handlers as LazyEvent instead of a dict.
+LAZY_EVENTS_ENV = "AWS_LAMBDA_LAZY_EVENTS"
+
+
+class LazyEvent(Mapping):
+    """
+    LazyEvent is a read-only Mapping over a JSON object event that is only decoded the first time one of its keys is
+    accessed, so handlers that route on a single key or forward the event as it is do not pay for a full decode.
+    The payload is available as received, without any decoding, in `raw`. A LazyEvent returned by the handler, or
+    nested in its response, is encoded back from `raw` if it has not been decoded yet.
+    """
+
+    __slots__ = ("raw", "_event")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._event = None
+
+    def _decoded(self):
+        event = self._event
+        if event is None:
+            event = self._event = _unmarshal_json(self.raw)
+        return event
+
+    def _for_json(self):
+        if self._event is not None:
+            return self._event
+        raw = self.raw if isinstance(self.raw, str) else str(self.raw, "utf-8")
+        return json.raw_json.RawJSON(raw)
+
+    def __getitem__(self, key):
+        return self._decoded()[key]
+
+    def __iter__(self):
+        return iter(self._decoded())
+
+    def __len__(self):
+        return len(self._decoded())
+
+    def __contains__(self, key):
+        return key in self._decoded()
+
+    def get(self, key, default=None):
+        return self._decoded().get(key, default)
+
+    def __repr__(self):
+        return "LazyEvent({!r})".format(self._decoded())
+
+
+def _is_json_object(request):
+    # Only the first few bytes are looked at, anything unusual is simply decoded eagerly.
+    head = request[:64]
+    if not isinstance(head, str):
+        head = bytes(head).decode("utf-8", "replace")
+    return head.lstrip()[:1] == "{"
+
+
+def _payload_text(request):
+    return request if isinstance(request, str) else str(request, "utf-8")
+
+
+def _decode_ndjson(request):
+    return [
+        _unmarshal_json(line)
+        for line in _payload_text(request).splitlines()
+        if line.strip()
+    ]
+
+
+def _encode_ndjson(response):
+    return "".join(to_json(item) + "\n" for item in response)
+
+
+def _decode_form(request):
+    return parse_qs(_payload_text(request), keep_blank_values=True)
+
+
+def _encode_form(response):
+    return urlencode(response, doseq=True)
+
+
+def _decode_base64(request):
+    return base64.b64decode(request, validate=True)
+
+
+def _encode_base64(response):
+    if isinstance(response, str):
+        response = response.encode("utf-8")
+    return base64.b64encode(response)
+
+
+# Either function of a codec may be None when the content type is only supported in one direction.
+Codec = namedtuple("Codec", ["decode", "encode"])
+
+_CODECS = {
+    "application/json": Codec(_unmarshal_json, to_json),
+    "application/x-ndjson": Codec(_decode_ndjson, _encode_ndjson),
+    "application/x-www-form-urlencoded": Codec(_decode_form, _encode_form),
+    "application/base64": Codec(_decode_base64, _encode_base64),
+}
+
+
+def _media_type(content_type):
+    return content_type.partition(";")[0].strip().lower()
+
+
+def _codec_for(content_type):
+    if content_type is None:
+        return None
+    # The exact lookup spares the parsing for the content types RAPID actually sends.
+    return _CODECS.get(content_type) or _CODECS.get(_media_type(content_type))
+
+
+def register_codec(content_type, decode=None, encode=None):
+    """
+    Registers how payloads of the given content type are handled, replacing any previous codec for it. `decode` is
+    called with the event payload (a bytes-like object) and returns the event passed to the handler; `encode` is
+    called with the body of a LambdaResponse and returns the response payload as bytes or str. Content type
+    parameters, such as the charset, are ignored when looking codecs up.
+
+        register_codec("application/msgpack", msgpack.unpackb, msgpack.packb)
+    """
+    _CODECS[_media_type(content_type)] = Codec(decode, encode)
+
+
+class LambdaResponse(object):
+    """
+    LambdaResponse is returned by handlers to send their response with a content type other than application/json.
+    The body is encoded with the codec registered for `content_type`; without one, bytes, buffers and str bodies are
+    posted as they are. A body that is an iterator, an async iterator or a file-like object is streamed with
+    `content_type` instead.
+    """
+
+    __slots__ = ("body", "content_type")
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.content_type = content_type
+
+    def __repr__(self):
+        return "LambdaResponse({!r}, {!r})".format(self.body, self.content_type)
 
 
 class LambdaMarshaller:
-    def __init__(self):
-        self.jsonEncoder = Encoder()
+    def __init__(self, lazy_events=None):
+        self.jsonEncoder = _encoder
+        if lazy_events is None:
+            lazy_events = os.environ.get(LAZY_EVENTS_ENV, "").lower() == "true"
+        self.lazy_events = lazy_events
 
     def unmarshal_request(self, request, content_type="application/json"):
-        if content_type != "application/json":
-            return request
+        # The native client hands the event payload over as a read-only memoryview over its own buffer.
+        codec = _codec_for(content_type)
+        if codec is None or codec.decode is None:
+            return bytes(request) if isinstance(request, memoryview) else request
+        if codec.decode is _unmarshal_json:
+            if self.lazy_events and _is_json_object(request):
+                return LazyEvent(request)
+            return _unmarshal_json(request)
         try:
-            return json.loads(request)
+            return codec.decode(request)
+        except FaultException:
+            raise
         except Exception as e:
             raise FaultException(
                 FaultException.UNMARSHAL_ERROR,
@@ -54,8 +393,10 @@ class LambdaMarshaller:
             )
 
     def marshal_response(self, response):
-        if isinstance(response, bytes):
+        if isinstance(response, _BINARY_RESPONSE_TYPES):
             return response, "application/unknown"
+        if isinstance(response, LambdaResponse):
+            return self._marshal_typed_response(response)
 
         try:
             return self.jsonEncoder.encode(response), "application/json"
@@ -65,3 +406,25 @@ class LambdaMarshaller:
                 "Unable to marshal response: {}".format(str(e)),
                 None,
             )
+
+    def _marshal_typed_response(self, response):
+        body, content_type = response.body, response.content_type
+        codec = _codec_for(content_type)
+        if codec is None or codec.encode is None:
+            if isinstance(body, _BINARY_RESPONSE_TYPES + (str,)):
+                return body, content_type
+            raise FaultException(
+                FaultException.MARSHAL_ERROR,
+                "Unable to marshal response: no codec registered for {}".format(
+                    content_type
+                ),
+                None,
+            )
+        try:
+            return codec.encode(body), content_type
+        except Exception as e:
+            raise FaultException(
+                FaultException.MARSHAL_ERROR,
+                "Unable to marshal response: {}".format(str(e)),
+                None,
+            )
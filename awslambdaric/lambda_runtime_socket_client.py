@@ -0,0 +1,325 @@
+"""
+Copyright 2026 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+"""
+
+import base64
+import os
+import select
+import socket
+import sys
+from collections import namedtuple
+
+_RUNTIME_API_PATH = "/2018-06-01/runtime"
+_READ_BUFFER_SIZE = 64 * 1024
+# Payloads smaller than this are sent in the same syscall as the request head.
+_COALESCE_BODY_LIMIT = 64 * 1024
+
+_STREAMING_HEADERS = (
+    b"Lambda-Runtime-Function-Response-Mode: streaming",
+    b"Transfer-Encoding: chunked",
+    b"Trailer: Lambda-Runtime-Function-Error-Type, Lambda-Runtime-Function-Error-Body",
+)
+
+# Mirrors runtime_client.InvocationRequest of the native extension.
+InvocationRequest = namedtuple(
+    "InvocationRequest",
+    [
+        "invoke_id",
+        "x_amzn_trace_id",
+        "invoked_function_arn",
+        "deadline_time_in_ms",
+        "client_context",
+        "cognito_identity",
+        "tenant_id",
+        "content_type",
+        "event_body",
+    ],
+)
+
+
+def _header_value(headers, name):
+    value = headers.get(name)
+    return value.decode("utf-8") if value else None
+
+
+class PostError(RuntimeError):
+    """Raised by post_and_next when the result could not be posted, in which case the next invocation was not
+    requested."""
+
+
+class RuntimeApiConnection(object):
+    """
+    RuntimeApiConnection is a pure-Python HTTP/1.1 client for the Lambda Runtime API. It keeps a single keep-alive
+    socket to RAPID open across invocations and parses the response headers of /next directly into the invocation
+    fields, mirroring what the native runtime_client extension returns.
+    """
+
+    def __init__(self, lambda_runtime_address, user_agent):
+        host, _, port = lambda_runtime_address.rpartition(":")
+        self.host = host.strip("[]")
+        self.port = int(port)
+        self._host_header = lambda_runtime_address.encode("latin-1")
+        self._user_agent = user_agent.encode("latin-1")
+        self._sock = None
+        self._reader = None
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        self._reader = sock.makefile("rb", _READ_BUFFER_SIZE)
+
+    def _is_dropped(self):
+        # An idle keep-alive socket only becomes readable when RAPID has closed it.
+        return bool(select.select([self._sock], [], [], 0)[0])
+
+    def close(self):
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+            self._sock = None
+            self._reader = None
+
+    def _request_head(self, method, path, extra_headers, content_length):
+        lines = [
+            b"%s %s HTTP/1.1" % (method, path.encode("latin-1")),
+            b"Host: " + self._host_header,
+            b"User-Agent: " + self._user_agent,
+        ]
+        lines.extend(extra_headers)
+        if content_length is not None:
+            lines.append(b"Content-Length: %d" % content_length)
+        lines.append(b"\r\n")
+        return b"\r\n".join(lines)
+
+    def _send(self, head, body):
+        if body is None:
+            self._sock.sendall(head)
+        elif len(body) < _COALESCE_BODY_LIMIT:
+            self._sock.sendall(head + bytes(body))
+        else:
+            self._sock.sendall(head)
+            self._sock.sendall(body)
+
+    def _read_response(self):
+        status_line = self._reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Runtime API closed the connection")
+        status = int(status_line.split(None, 2)[1])
+
+        headers = {}
+        while True:
+            line = self._reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.partition(b":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get(b"transfer-encoding", b"").lower() == b"chunked":
+            body = self._read_chunked_body()
+        else:
+            body = self._read_exact(int(headers.get(b"content-length", 0)))
+
+        if headers.get(b"connection", b"").lower() == b"close":
+            self.close()
+        return status, headers, body
+
+    def _read_exact(self, length):
+        body = self._reader.read(length)
+        if len(body) != length:
+            raise ConnectionResetError("Runtime API closed the connection")
+        return body
+
+    def _read_chunked_body(self):
+        chunks = []
+        while True:
+            size = int(self._reader.readline().split(b";", 1)[0], 16)
+            if size == 0:
+                # Skip trailers up to the terminating empty line.
+                while self._reader.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(self._read_exact(size))
+            self._reader.readline()
+
+    def request(self, method, path, extra_headers=(), body=None):
+        head = self._request_head(
+            method, path, extra_headers, None if body is None else len(body)
+        )
+        # RAPID may have dropped the idle keep-alive connection, check before sending anything on it.
+        if self._sock is not None and self._is_dropped():
+            self.close()
+        reused = self._sock is not None
+        sent = False
+        try:
+            if not reused:
+                self._connect()
+            self._send(head, body)
+            sent = True
+            return self._read_response()
+        except ConnectionError:
+            self.close()
+            # Once the request is out RAPID may have acted on it, so it must not be sent twice.
+            if not reused or sent:
+                raise
+        # Sending failed on a reused connection, retry once on a fresh one.
+        try:
+            self._connect()
+            self._send(head, body)
+            return self._read_response()
+        except Exception:
+            self.close()
+            raise
+
+    def next(self):
+        try:
+            status, headers, body = self.request(
+                b"GET", _RUNTIME_API_PATH + "/invocation/next"
+            )
+        except OSError as e:
+            raise RuntimeError("Failed to get next") from e
+        if not 200 <= status < 300 or b"lambda-runtime-aws-request-id" not in headers:
+            raise RuntimeError("Failed to get next")
+
+        return InvocationRequest(
+            invoke_id=_header_value(headers, b"lambda-runtime-aws-request-id"),
+            x_amzn_trace_id=_header_value(headers, b"lambda-runtime-trace-id"),
+            invoked_function_arn=_header_value(
+                headers, b"lambda-runtime-invoked-function-arn"
+            )
+            or "",
+            deadline_time_in_ms=int(headers.get(b"lambda-runtime-deadline-ms") or 0),
+            client_context=_header_value(headers, b"lambda-runtime-client-context"),
+            cognito_identity=_header_value(headers, b"lambda-runtime-cognito-identity"),
+            tenant_id=_header_value(headers, b"lambda-runtime-aws-tenant-id"),
+            content_type=_header_value(headers, b"content-type"),
+            event_body=body,
+        )
+
+    def _post(self, path, content_type, payload, xray_fault, error_message):
+        extra_headers = (
+            b"Content-Type: " + content_type.encode("latin-1"),
+            b"Lambda-Runtime-Function-XRay-Error-Cause: " + xray_fault.encode("utf-8"),
+        )
+        try:
+            status, _, _ = self.request(b"POST", path, extra_headers, payload)
+        except OSError as e:
+            raise RuntimeError(error_message) from e
+        if not 200 <= status < 300:
+            raise RuntimeError(error_message)
+
+    def post_invocation_result(self, invoke_id, result_data, content_type):
+        if isinstance(result_data, str):
+            result_data = result_data.encode("utf-8")
+        self._post(
+            f"{_RUNTIME_API_PATH}/invocation/{invoke_id}/response",
+            content_type,
+            memoryview(result_data).cast("B"),
+            "",
+            "Failed to post invocation response",
+        )
+
+    def post_and_next(self, invoke_id, result_data, content_type):
+        try:
+            self.post_invocation_result(invoke_id, result_data, content_type)
+        except RuntimeError as e:
+            raise PostError(str(e)) from e
+        return self.next()
+
+    def _send_chunk(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        chunk = memoryview(chunk).cast("B")
+        if not chunk:
+            # A zero-length chunk would terminate the stream early.
+            return
+        if len(chunk) < _COALESCE_BODY_LIMIT:
+            self._sock.sendall(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        else:
+            self._sock.sendall(b"%x\r\n" % len(chunk))
+            self._sock.sendall(chunk)
+            self._sock.sendall(b"\r\n")
+
+    def post_invocation_stream(self, invoke_id, chunks, content_type, on_error):
+        """
+        Sends the response as it is produced, one HTTP chunk per item of `chunks` (bytes-like or str). If producing
+        the next chunk raises, on_error(exc_info) must return the (error_type, error_body) pair reported to RAPID in
+        the trailers of the stream.
+        """
+        path = f"{_RUNTIME_API_PATH}/invocation/{invoke_id}/response"
+        extra_headers = (b"Content-Type: " + content_type.encode("latin-1"),)
+        head = self._request_head(
+            b"POST", path, extra_headers + _STREAMING_HEADERS, None
+        )
+        try:
+            # The stream cannot be replayed, so make sure the connection is alive before sending anything.
+            if self._sock is not None and self._is_dropped():
+                self.close()
+            if self._sock is None:
+                self._connect()
+            self._sock.sendall(head)
+
+            trailers = b""
+            # The module-level next() below shadows the builtin.
+            next_chunk = iter(chunks).__next__
+            while True:
+                try:
+                    chunk = next_chunk()
+                except StopIteration:
+                    break
+                except Exception:
+                    error_type, error_body = on_error(sys.exc_info())
+                    trailers = (
+                        b"Lambda-Runtime-Function-Error-Type: %s\r\n"
+                        b"Lambda-Runtime-Function-Error-Body: %s\r\n"
+                        % (
+                            error_type.encode("utf-8"),
+                            base64.b64encode(error_body.encode("utf-8")),
+                        )
+                    )
+                    break
+                self._send_chunk(chunk)
+
+            self._sock.sendall(b"0\r\n%s\r\n" % trailers)
+            status, _, _ = self._read_response()
+        except OSError as e:
+            self.close()
+            raise RuntimeError("Failed to post invocation response") from e
+        if not 200 <= status < 300:
+            raise RuntimeError("Failed to post invocation response")
+
+    def post_error(self, invoke_id, error_response_data, xray_fault):
+        self._post(
+            f"{_RUNTIME_API_PATH}/invocation/{invoke_id}/error",
+            "application/json",
+            error_response_data.encode("utf-8"),
+            xray_fault,
+            "Failed to post invocation error",
+        )
+
+
+# Module-level functions below mirror the surface of the native runtime_client extension.
+_connection = None
+
+
+def initialize_client(user_agent):
+    global _connection
+    _connection = RuntimeApiConnection(
+        os.environ.get("AWS_LAMBDA_RUNTIME_API", "127.0.0.1:9001"), user_agent
+    )
+
+
+def next():
+    return _connection.next()
+
+
+def post_invocation_result(invoke_id, result_data, content_type):
+    _connection.post_invocation_result(invoke_id, result_data, content_type)
+
+
+def post_error(invoke_id, error_response_data, xray_fault):
+    _connection.post_error(invoke_id, error_response_data, xray_fault)
+
+
+def post_and_next(invoke_id, result_data, content_type):
+    return _connection.post_and_next(invoke_id, result_data, content_type)
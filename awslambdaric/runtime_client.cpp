@@ -5,11 +5,101 @@
 #include <aws/lambda-runtime/version.h>
 #include <chrono>
 
-#define NULL_IF_EMPTY(v) (((v) == NULL || (v)[0] == 0) ? NULL : (v))
-
 static const std::string ENDPOINT(getenv("AWS_LAMBDA_RUNTIME_API") ? getenv("AWS_LAMBDA_RUNTIME_API") : "127.0.0.1:9001");
 static aws::lambda_runtime::runtime *CLIENT;
 
+/*
+ * PayloadBuffer owns the event payload received from the Runtime API and exposes it through the buffer protocol, so
+ * the payload can be handed to Python as a read-only memoryview without copying it into a bytes object.
+ */
+typedef struct {
+    PyObject_HEAD
+    std::string *payload;
+} PayloadBuffer;
+
+static PyObject *PayloadBufferType;
+
+/*
+ * InvocationRequest is a struct sequence holding the fields of the next invocation, so that each invocation costs
+ * one small tuple-like object instead of a dict of headers that has to be copied into another object.
+ */
+#define INVOCATION_REQUEST_FIELDS 9
+
+static PyStructSequence_Field InvocationRequest_Fields[] = {
+        {"invoke_id",            NULL},
+        {"x_amzn_trace_id",      NULL},
+        {"invoked_function_arn", NULL},
+        {"deadline_time_in_ms",  NULL},
+        {"client_context",       NULL},
+        {"cognito_identity",     NULL},
+        {"tenant_id",            NULL},
+        {"content_type",         NULL},
+        {"event_body",           NULL},
+        {NULL,                   NULL}
+};
+
+static PyStructSequence_Desc InvocationRequest_Desc = {
+        "runtime_client.InvocationRequest",
+        NULL,
+        InvocationRequest_Fields,
+        INVOCATION_REQUEST_FIELDS
+};
+
+static PyTypeObject InvocationRequestType;
+
+// Raised by post_and_next when the result could not be posted, in which case the next invocation was not requested.
+static PyObject *PostError;
+
+static int payload_buffer_getbuffer(PyObject *self, Py_buffer *view, int flags) {
+    std::string *payload = ((PayloadBuffer *) self)->payload;
+    return PyBuffer_FillInfo(view, self, (void *) payload->data(), (Py_ssize_t) payload->size(), 1, flags);
+}
+
+static void payload_buffer_dealloc(PyObject *self) {
+    PyTypeObject *type = Py_TYPE(self);
+    delete ((PayloadBuffer *) self)->payload;
+    type->tp_free(self);
+    Py_DECREF(type);
+}
+
+static PyType_Slot PayloadBuffer_Slots[] = {
+        {Py_tp_dealloc,    (void *) payload_buffer_dealloc},
+        {Py_bf_getbuffer,  (void *) payload_buffer_getbuffer},
+        {0,                NULL}
+};
+
+static PyType_Spec PayloadBuffer_Spec = {
+        "runtime_client.PayloadBuffer",
+        sizeof(PayloadBuffer),
+        0,
+        Py_TPFLAGS_DEFAULT,
+        PayloadBuffer_Slots
+};
+
+static PyObject *payload_as_memoryview(std::string &payload) {
+    PayloadBuffer *buffer = PyObject_New(PayloadBuffer, (PyTypeObject *) PayloadBufferType);
+    if (buffer == NULL) {
+        return NULL;
+    }
+    buffer->payload = new std::string(std::move(payload));
+
+    PyObject *view = PyMemoryView_FromObject((PyObject *) buffer);
+    Py_DECREF(buffer);  // the memoryview keeps its own reference to the buffer
+    return view;
+}
+
+/*
+ * buffer_response is a success invocation_response whose payload is copied exactly once, straight out of the Python
+ * buffer it was posted from, instead of going through an intermediate std::string.
+ */
+class buffer_response : public aws::lambda_runtime::invocation_response {
+public:
+    buffer_response(const char *data, size_t length, std::string const &content_type)
+        : invocation_response(std::string(), content_type, true, std::string()) {
+        m_payload.assign(data, length);
+    }
+};
+
 static PyObject *method_initialize_client(PyObject *self, PyObject *args) {
     char *user_agent_arg;
     if (!PyArg_ParseTuple(args, "s", &user_agent_arg)) {
@@ -24,9 +114,40 @@ static PyObject *method_initialize_client(PyObject *self, PyObject *args) {
     return Py_None;
 }
 
-static PyObject *method_next(PyObject *self) {
-    aws::lambda_runtime::invocation_request response;
+static PyObject *string_or_none(std::string const &value) {
+    if (value.empty()) {
+        Py_RETURN_NONE;
+    }
+    return PyUnicode_FromStringAndSize(value.data(), (Py_ssize_t) value.size());
+}
+
+static PyObject *build_next_result(aws::lambda_runtime::invocation_request &response) {
+    PyObject *result = PyStructSequence_New(&InvocationRequestType);
+    if (result == NULL) {
+        return NULL;
+    }
 
+    auto deadline = std::chrono::duration_cast<std::chrono::milliseconds>(response.deadline.time_since_epoch()).count();
+    PyStructSequence_SET_ITEM(result, 0, PyUnicode_FromStringAndSize(response.request_id.data(), (Py_ssize_t) response.request_id.size()));
+    PyStructSequence_SET_ITEM(result, 1, string_or_none(response.xray_trace_id));
+    PyStructSequence_SET_ITEM(result, 2, PyUnicode_FromStringAndSize(response.function_arn.data(), (Py_ssize_t) response.function_arn.size()));
+    PyStructSequence_SET_ITEM(result, 3, PyLong_FromLongLong(deadline));
+    PyStructSequence_SET_ITEM(result, 4, string_or_none(response.client_context));
+    PyStructSequence_SET_ITEM(result, 5, string_or_none(response.cognito_identity));
+    PyStructSequence_SET_ITEM(result, 6, string_or_none(response.tenant_id));
+    PyStructSequence_SET_ITEM(result, 7, string_or_none(response.content_type));
+    PyStructSequence_SET_ITEM(result, 8, payload_as_memoryview(response.payload));
+
+    for (Py_ssize_t i = 0; i < INVOCATION_REQUEST_FIELDS; i++) {
+        if (PyStructSequence_GET_ITEM(result, i) == NULL) {
+            Py_DECREF(result);  // releases the items that were created
+            return NULL;
+        }
+    }
+    return result;
+}
+
+static PyObject *method_next(PyObject *self) {
     // Release GIL and save thread state
     // ref: https://docs.python.org/3/c-api/init.html#thread-state-and-the-global-interpreter-lock
     PyThreadState *_save;
@@ -40,35 +161,11 @@ static PyObject *method_next(PyObject *self) {
         return NULL;
     }
 
-    response = outcome.get_result();
     // Reacquire GIL before constructing return object
     PyEval_RestoreThread(_save);
 
-    auto payload = response.payload;
-    auto request_id = response.request_id.c_str();
-    auto trace_id = response.xray_trace_id.c_str();
-    auto function_arn = response.function_arn.c_str();
-    auto deadline = std::chrono::duration_cast<std::chrono::milliseconds>(response.deadline.time_since_epoch()).count();
-    auto client_context = response.client_context.c_str();
-    auto content_type = response.content_type.c_str();
-    auto cognito_id = response.cognito_identity.c_str();
-    auto tenant_id = response.tenant_id.c_str();
-
-    PyObject *payload_bytes = PyBytes_FromStringAndSize(payload.c_str(), payload.length());
-    PyObject *result = Py_BuildValue("(O,{s:s,s:s,s:s,s:l,s:s,s:s,s:s,s:s})",
-                         payload_bytes,  //Py_BuildValue() increments reference counter
-                         "Lambda-Runtime-Aws-Request-Id", request_id,
-                         "Lambda-Runtime-Trace-Id", NULL_IF_EMPTY(trace_id),
-                         "Lambda-Runtime-Invoked-Function-Arn", function_arn,
-                         "Lambda-Runtime-Deadline-Ms", deadline,
-                         "Lambda-Runtime-Client-Context", NULL_IF_EMPTY(client_context),
-                         "Content-Type", NULL_IF_EMPTY(content_type),
-                         "Lambda-Runtime-Cognito-Identity", NULL_IF_EMPTY(cognito_id),
-                         "Lambda-Runtime-Aws-Tenant-Id", NULL_IF_EMPTY(tenant_id)
-    );
-
-    Py_XDECREF(payload_bytes);
-    return result;
+    // The outcome holds the only copy of the request, so the payload is moved out of it rather than copied.
+    return build_next_result(const_cast<aws::lambda_runtime::invocation_request &>(outcome.get_result()));
 }
 
 static PyObject *method_post_invocation_result(PyObject *self, PyObject *args) {
@@ -77,21 +174,25 @@ static PyObject *method_post_invocation_result(PyObject *self, PyObject *args) {
         return NULL;
     }
 
-    PyObject *invocation_response;
-    Py_ssize_t length;
-    char *request_id, *content_type, *response_as_c_string;
+    Py_buffer invocation_response;
+    char *request_id, *content_type;
 
-    if (!PyArg_ParseTuple(args, "sSs", &request_id, &invocation_response, &content_type)) {
+    // Accepts any contiguous buffer (bytes, bytearray, memoryview, mmap...) or a str, whose UTF-8 representation is
+    // read in place: for ASCII strings, such as JSON encoded with ensure_ascii, that is the str's own storage.
+    if (!PyArg_ParseTuple(args, "ss*s", &request_id, &invocation_response, &content_type)) {
         PyErr_SetString(PyExc_RuntimeError, "Wrong arguments");
         return NULL;
     }
 
-    length = PyBytes_Size(invocation_response);
-    response_as_c_string = PyBytes_AsString(invocation_response);
-    std::string response_string(response_as_c_string, response_as_c_string + length);
+    buffer_response response((const char *) invocation_response.buf, invocation_response.len, content_type);
+    PyBuffer_Release(&invocation_response);
 
-    auto response = aws::lambda_runtime::invocation_response::success(response_string, content_type);
+    // Release GIL while the response is uploaded so that other Python threads keep running
+    PyThreadState *_save;
+    _save = PyEval_SaveThread();
     auto outcome = CLIENT->post_success(request_id, response);
+    PyEval_RestoreThread(_save);
+
     if (!outcome.is_success()) {
         PyErr_SetString(PyExc_RuntimeError, "Failed to post invocation response");
         return NULL;
@@ -115,7 +216,12 @@ static PyObject *method_post_error(PyObject *self, PyObject *args) {
     }
 
     auto response = aws::lambda_runtime::invocation_response(response_string, "application/json", false, xray_fault);
+    // Release GIL while the error is uploaded so that other Python threads keep running
+    PyThreadState *_save;
+    _save = PyEval_SaveThread();
     auto outcome = CLIENT->post_failure(request_id, response);
+    PyEval_RestoreThread(_save);
+
     if (!outcome.is_success()) {
         PyErr_SetString(PyExc_RuntimeError, "Failed to post invocation error");
         return NULL;
@@ -125,11 +231,50 @@ static PyObject *method_post_error(PyObject *self, PyObject *args) {
     return Py_None;
 }
 
+static PyObject *method_post_and_next(PyObject *self, PyObject *args) {
+    if (CLIENT == nullptr) {
+        PyErr_SetString(PyExc_RuntimeError, "Client not yet initalized");
+        return NULL;
+    }
+
+    Py_buffer invocation_response;
+    char *request_id, *content_type;
+
+    if (!PyArg_ParseTuple(args, "ss*s", &request_id, &invocation_response, &content_type)) {
+        PyErr_SetString(PyExc_RuntimeError, "Wrong arguments");
+        return NULL;
+    }
+
+    buffer_response response((const char *) invocation_response.buf, invocation_response.len, content_type);
+    PyBuffer_Release(&invocation_response);
+    const std::string request_id_str(request_id);
+
+    // Post the result and long-poll for the next invocation without taking the GIL in between
+    PyThreadState *_save;
+    _save = PyEval_SaveThread();
+    auto post_outcome = CLIENT->post_success(request_id_str, response);
+    if (!post_outcome.is_success()) {
+        PyEval_RestoreThread(_save);
+        PyErr_SetString(PostError, "Failed to post invocation response");
+        return NULL;
+    }
+
+    auto outcome = CLIENT->get_next();
+    PyEval_RestoreThread(_save);
+    if (!outcome.is_success()) {
+        PyErr_SetString(PyExc_RuntimeError, "Failed to get next");
+        return NULL;
+    }
+
+    return build_next_result(const_cast<aws::lambda_runtime::invocation_request &>(outcome.get_result()));
+}
+
 static PyMethodDef Runtime_Methods[] = {
         {"initialize_client",      method_initialize_client,      METH_VARARGS, NULL},
         {"next",                   (PyCFunction) method_next,     METH_NOARGS,  NULL},
         {"post_invocation_result", method_post_invocation_result, METH_VARARGS, NULL},
         {"post_error",             method_post_error,             METH_VARARGS, NULL},
+        {"post_and_next",          method_post_and_next,          METH_VARARGS, NULL},
         {NULL,                     NULL,                          0,            NULL}
 };
 
@@ -146,5 +291,33 @@ static struct PyModuleDef runtime_client = {
 };
 
 PyMODINIT_FUNC PyInit_runtime_client(void) {
-    return PyModule_Create(&runtime_client);
+    PayloadBufferType = PyType_FromSpec(&PayloadBuffer_Spec);
+    if (PayloadBufferType == NULL) {
+        return NULL;
+    }
+    if (InvocationRequestType.tp_name == NULL &&
+        PyStructSequence_InitType2(&InvocationRequestType, &InvocationRequest_Desc) < 0) {
+        return NULL;
+    }
+
+    PyObject *module = PyModule_Create(&runtime_client);
+    if (module == NULL) {
+        return NULL;
+    }
+    Py_INCREF(&InvocationRequestType);
+    if (PyModule_AddObject(module, "InvocationRequest", (PyObject *) &InvocationRequestType) < 0) {
+        Py_DECREF(&InvocationRequestType);
+        Py_DECREF(module);
+        return NULL;
+    }
+
+    PostError = PyErr_NewException("runtime_client.PostError", PyExc_RuntimeError, NULL);
+    Py_XINCREF(PostError);
+    if (PyModule_AddObject(module, "PostError", PostError) < 0) {
+        Py_XDECREF(PostError);
+        Py_CLEAR(PostError);
+        Py_DECREF(module);
+        return NULL;
+    }
+    return module;
 }
@@ -0,0 +1,59 @@
+"""
+Copyright 2026 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Measures marshalling a synthetic DynamoDB Query result, as returned by boto3 with every number deserialized into a
+Decimal, comparing the Encoder.default callback per Decimal with simplejson's native Decimal encoding.
+
+    python -m tests.benchmarks.bench_decimal_encoding
+"""
+
+import decimal
+import timeit
+
+from awslambdaric.lambda_runtime_marshaller import Encoder
+
+ITEMS = 1000
+ITERATIONS = 20
+
+
+def query_result(items=ITEMS):
+    return {
+        "Items": [
+            {
+                "pk": f"ORDER#{i:08d}",
+                "sk": f"LINE#{i % 7}",
+                "quantity": decimal.Decimal(i % 13),
+                "price": decimal.Decimal(f"{i * 7 % 1000}.{i % 100:02d}"),
+                "discount": decimal.Decimal("0.15"),
+                "createdAt": decimal.Decimal(1700000000 + i),
+                "dimensions": [decimal.Decimal(f"{i % 50}.5")] * 3,
+                "tags": ["priority", "gift"],
+            }
+            for i in range(items)
+        ],
+        "Count": decimal.Decimal(items),
+        "ScannedCount": decimal.Decimal(items),
+    }
+
+
+def bench(encoder, result):
+    return min(
+        timeit.repeat(lambda: encoder.encode(result), number=ITERATIONS, repeat=5)
+    )
+
+
+def main():
+    result = query_result()
+    native = Encoder()
+    callback = Encoder()
+    # Routes every Decimal through Encoder.default, as on simplejson releases without native NaN handling.
+    callback.use_decimal = False
+    assert native.encode(result) == callback.encode(result)
+
+    for name, encoder in (("default() callback", callback), ("native", native)):
+        per_call_ms = bench(encoder, result) / ITERATIONS * 1e3
+        print(f"{name:>20}: {per_call_ms:8.2f} ms/result ({ITEMS} items)")
+
+
+if __name__ == "__main__":
+    main()
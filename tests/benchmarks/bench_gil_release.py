@@ -0,0 +1,89 @@
+"""
+Copyright 2026 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Measures how much a background Python thread gets done while the runtime client posts large responses. A client that
+holds the GIL for the whole upload starves the thread; one that releases it lets the thread run at close to its idle
+rate. The fake Runtime API runs in a separate process so that it does not compete for the GIL itself.
+
+    python -m tests.benchmarks.bench_gil_release
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from tests.fake_runtime_api import FakeRuntimeApi
+
+POSTS = 20
+PAYLOAD = b"x" * (6 * 1024 * 1024)
+
+
+def serve(conn):
+    with FakeRuntimeApi(record_bodies=False) as api:
+        conn.send(api.address)
+        conn.recv()
+
+
+class BackgroundCounter(object):
+    def __init__(self):
+        self.count = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while self.running:
+            self.count += 1
+
+    def rate_during(self, func):
+        start_count, start = self.count, time.perf_counter()
+        func()
+        return (self.count - start_count) / (time.perf_counter() - start)
+
+
+def post_all(client):
+    for i in range(POSTS):
+        client.post_invocation_result(str(i), PAYLOAD, "application/octet-stream")
+
+
+def main():
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=serve, args=(child_conn,), daemon=True)
+    server.start()
+    address = parent_conn.recv()
+    # The native client reads the endpoint once, when it is loaded.
+    os.environ["AWS_LAMBDA_RUNTIME_API"] = address
+
+    from awslambdaric import lambda_runtime_socket_client
+    from awslambdaric.lambda_runtime_client import _user_agent
+
+    clients = [("python", lambda_runtime_socket_client)]
+    try:
+        import runtime_client
+
+        clients.append(("native", runtime_client))
+    except ImportError:
+        print("native runtime_client is not built, skipping it", file=sys.stderr)
+
+    counter = BackgroundCounter()
+    idle_rate = counter.rate_during(lambda: time.sleep(1))
+    print(f"   idle: {idle_rate:12.0f} background iterations/s")
+    for name, client in clients:
+        client.initialize_client(_user_agent())
+        start = time.perf_counter()
+        rate = counter.rate_during(lambda: post_all(client))
+        per_post_ms = (time.perf_counter() - start) / POSTS * 1e3
+        print(
+            f"{name:>7}: {rate:12.0f} background iterations/s "
+            f"({rate / idle_rate:6.1%} of idle), {per_post_ms:.1f} ms/post"
+        )
+
+    counter.running = False
+    parent_conn.send(None)
+    server.join()
+
+
+if __name__ == "__main__":
+    main()
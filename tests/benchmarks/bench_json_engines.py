@@ -0,0 +1,51 @@
+"""
+Copyright 2026 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Measures how long LambdaMarshaller.unmarshal_request takes to decode a large API Gateway proxy event handed over as a
+memoryview, for each JSON engine that can be selected with AWS_LAMBDA_JSON_ENGINE.
+
+    python -m tests.benchmarks.bench_json_engines
+"""
+
+import json
+import os
+import timeit
+
+from awslambdaric import lambda_runtime_marshaller
+from awslambdaric.lambda_runtime_marshaller import LambdaMarshaller
+
+ITERATIONS = 200
+
+
+def api_gateway_event():
+    item = {"id": 1234567, "name": "ünïcödé item", "price": 12.5, "tags": ["a", "b"]}
+    return {
+        "resource": "/items",
+        "path": "/items",
+        "httpMethod": "POST",
+        "headers": {f"X-Header-{i}": "value" * 4 for i in range(40)},
+        "requestContext": {"requestId": "c6af9ac6-7b61-11e6-9a41-93e8deadbeef"},
+        "body": json.dumps({"items": [item] * 2000}),
+        "isBase64Encoded": False,
+    }
+
+
+def main():
+    payload = memoryview(json.dumps(api_gateway_event()).encode("utf-8"))
+    marshaller = LambdaMarshaller()
+    print(f"payload: {len(payload) / 1024:.0f} KiB")
+    for engine in ("simplejson", "json", "orjson"):
+        os.environ[lambda_runtime_marshaller.JSON_ENGINE_ENV] = engine
+        selected = lambda_runtime_marshaller._select_json_engine()
+        seconds = min(
+            timeit.repeat(
+                lambda: marshaller.unmarshal_request(payload),
+                number=ITERATIONS,
+                repeat=5,
+            )
+        )
+        print(f"{engine:>12} ({selected}): {seconds / ITERATIONS * 1e3:8.3f} ms/event")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Copyright 2026 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Measures log formatting throughput in records per second, comparing the JsonFormatter used for AWS_LAMBDA_LOG_FORMAT=JSON
+with the implementation it replaced, which formatted the timestamp and filtered record attributes on every record, and
+the TextFormatter used for the TEXT format with the stock logging.Formatter it replaced.
+
+    python -m tests.benchmarks.bench_log_formatters
+"""
+
+import logging
+import sys
+import time
+import timeit
+import traceback
+
+from awslambdaric.lambda_runtime_log_utils import (
+    _JSON_FRAME_TYPES,
+    _RESERVED_FIELDS,
+    JsonFormatter,
+    TextFormatter,
+    _encode_json,
+    _format_log_level,
+)
+
+RECORDS = 10000
+TEXT_FORMAT = (
+    "[%(levelname)s]\t%(asctime)s.%(msecs)03dZ\t%(aws_request_id)s\t%(message)s\n"
+)
+
+
+class LegacyJsonFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__(datefmt="%Y-%m-%dT%H:%M:%SZ")
+
+    def format(self, record):
+        record.levelno = _format_log_level(record)
+        record.levelname = logging.getLevelName(record.levelno)
+        record._frame_type = _JSON_FRAME_TYPES.get(
+            record.levelno, _JSON_FRAME_TYPES[logging.NOTSET]
+        )
+        exc_info = record.exc_info
+        result = {
+            "timestamp": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "logger": record.name,
+            "stackTrace": traceback.format_tb(exc_info[2]) if exc_info else None,
+            "errorType": exc_info[0].__name__ if exc_info else None,
+            "errorMessage": str(exc_info[1]) if exc_info else None,
+            "requestId": getattr(record, "aws_request_id", None),
+            "location": (
+                f"{record.pathname}:{record.funcName}:{record.lineno}"
+                if exc_info
+                else None
+            ),
+        }
+        if getattr(record, "tenant_id", None) is not None:
+            result["tenantId"] = record.tenant_id
+        result.update(
+            (key, value)
+            for key, value in record.__dict__.items()
+            if key not in _RESERVED_FIELDS and key not in result
+        )
+        result = {k: v for k, v in result.items() if v is not None}
+        return _encode_json(result) + "\n"
+
+
+def make_record(extra=None, exc_info=None):
+    record = logging.LogRecord(
+        "app.orders",
+        logging.INFO,
+        "/var/task/app.py",
+        42,
+        "order %s",
+        ("1234",),
+        exc_info,
+    )
+    record.aws_request_id = "8f507cfc-7c05-4d6a-a8f9-5e7a1c3e1b2f"
+    record.tenant_id = None
+    record.__dict__.update(extra or {})
+    return record
+
+
+def records():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        exc_info = sys.exc_info()
+    return {
+        "plain": make_record(),
+        "extras": make_record({"orderId": 1234, "customer": "c-42", "total": 12.5}),
+        "exc_info": make_record(exc_info=exc_info),
+    }
+
+
+def bench(formatter, record):
+    return RECORDS / min(
+        timeit.repeat(lambda: formatter.format(record), number=RECORDS, repeat=5)
+    )
+
+
+def compare(name, legacy, current):
+    print(name)
+    for record_name, record in records().items():
+        record.exc_text = None
+        expected = legacy.format(record)
+        record.exc_text = None
+        assert expected == current.format(record), record_name
+        print(
+            f"{record_name:>10}: legacy {bench(legacy, record):10.0f} records/s, "
+            f"{type(current).__name__} {bench(current, record):10.0f} records/s"
+        )
+
+
+def main():
+    logging.Formatter.converter = time.gmtime
+    compare("JSON", LegacyJsonFormatter(), JsonFormatter())
+    compare(
+        "TEXT", logging.Formatter(TEXT_FORMAT, "%Y-%m-%dT%H:%M:%S"), TextFormatter()
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Copyright 2026 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Measures the per-invoke overhead of polling for the next invocation from a separate thread, comparing a
+ThreadPoolExecutor created for every invocation with the long-lived NextInvocationPoller. The poll itself is a no-op,
+so the numbers are pure hand-over cost.
+
+    python -m tests.benchmarks.bench_next_poller
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from awslambdaric.lambda_runtime_client import NextInvocationPoller
+
+ITERATIONS = 20000
+
+
+def get_next():
+    return b"{}", {}
+
+
+def thread_pool_per_invoke():
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(get_next)
+    return future.result()
+
+
+def bench(func):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        func()
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def main():
+    poller = NextInvocationPoller(get_next)
+    results = [
+        ("direct call", bench(get_next)),
+        ("ThreadPoolExecutor per invoke", bench(thread_pool_per_invoke)),
+        ("NextInvocationPoller", bench(poller.next)),
+    ]
+    for name, per_invoke_us in results:
+        print(f"{name:>30}: {per_invoke_us:8.2f} us/invoke")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Copyright 2026 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Compares the per-invoke cost of the native runtime_client extension with the pure-Python socket transport by running
+next/post_invocation_result round-trips against an in-process fake Runtime API.
+
+    python -m tests.benchmarks.bench_runtime_transport
+"""
+
+import os
+import sys
+import time
+
+from tests.fake_runtime_api import FakeRuntimeApi
+
+ITERATIONS = 2000
+PAYLOAD_SIZES = (128, 64 * 1024, 1024 * 1024)
+
+
+def bench(client, api, payload_size):
+    event = b'{"payload": "%s"}' % (b"x" * payload_size)
+    for i in range(ITERATIONS):
+        api.add_event(event, request_id=str(i))
+
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        req = client.next()
+        client.post_invocation_result(req.invoke_id, req.event_body, "application/json")
+    elapsed = time.perf_counter() - start
+    api.wait_for_posts(ITERATIONS)
+    api.posts.clear()
+    return elapsed / ITERATIONS * 1e6
+
+
+def main():
+    with FakeRuntimeApi() as api:
+        # The native client reads the endpoint once, when it is loaded.
+        os.environ["AWS_LAMBDA_RUNTIME_API"] = api.address
+
+        from awslambdaric import lambda_runtime_socket_client
+        from awslambdaric.lambda_runtime_client import _user_agent
+
+        clients = [("python", lambda_runtime_socket_client)]
+        try:
+            import runtime_client
+
+            clients.append(("native", runtime_client))
+        except ImportError:
+            print("native runtime_client is not built, skipping it", file=sys.stderr)
+
+        for name, client in clients:
+            client.initialize_client(_user_agent())
+            for payload_size in PAYLOAD_SIZES:
+                per_invoke_us = bench(client, api, payload_size)
+                print(f"{name:>7} {payload_size:>8} B: {per_invoke_us:8.1f} us/invoke")
+
+
+if __name__ == "__main__":
+    main()
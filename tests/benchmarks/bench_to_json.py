@@ -0,0 +1,40 @@
+"""
+Copyright 2026 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+
+Measures the per-call cost of to_json for a typical error response, comparing an Encoder built on every call (and
+reading AWS_EXECUTION_ENV each time) with the encoder selected once at import.
+
+    python -m tests.benchmarks.bench_to_json
+"""
+
+import timeit
+
+from awslambdaric.lambda_runtime_marshaller import Encoder, to_json
+
+ITERATIONS = 50000
+
+ERROR_RESULT = {
+    "errorMessage": "division by zero",
+    "errorType": "ZeroDivisionError",
+    "requestId": "8f507cfc-7c05-4d6a-a8f9-5e7a1c3e1b2f",
+    "stackTrace": [
+        '  File "/var/task/app.py", line 12, in handler\n    return 1 / 0\n',
+    ],
+}
+
+
+def bench(func):
+    return min(timeit.repeat(func, number=ITERATIONS, repeat=5)) / ITERATIONS * 1e6
+
+
+def main():
+    results = [
+        ("Encoder per call", bench(lambda: Encoder().encode(ERROR_RESULT))),
+        ("to_json", bench(lambda: to_json(ERROR_RESULT))),
+    ]
+    for name, per_call_us in results:
+        print(f"{name:>20}: {per_call_us:8.2f} us/call")
+
+
+if __name__ == "__main__":
+    main()
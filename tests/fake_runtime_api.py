@@ -0,0 +1,114 @@
+"""
+Copyright 2026 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+"""
+
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_NEXT_PATH = "/2018-06-01/runtime/invocation/next"
+_INVOCATION_PATH = "/2018-06-01/runtime/invocation/"
+
+
+class FakeRuntimeApi(object):
+    """
+    FakeRuntimeApi is a minimal in-process Lambda Runtime API (RAPID) speaking keep-alive HTTP/1.1. Events queued with
+    add_event are handed out by /next and everything posted back is recorded in `posts` as
+    (path, headers, body, trailers) tuples. Bodies are replaced by their length when record_bodies is False.
+    """
+
+    def __init__(self, record_bodies=True):
+        self.record_bodies = record_bodies
+        self.events = queue.Queue()
+        self.posts = []
+        self.connections = 0
+        self.posted = threading.Condition()
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                api.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != _NEXT_PATH:
+                    self.send_error(404)
+                    return
+                body, headers = api.events.get()
+                self.send_response(200)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_chunked(self):
+                chunks = []
+                while True:
+                    size = int(self.rfile.readline().split(b";", 1)[0], 16)
+                    if size == 0:
+                        break
+                    chunks.append(self.rfile.read(size))
+                    self.rfile.readline()
+                trailers = {}
+                while True:
+                    line = self.rfile.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    trailers[name.strip()] = value.strip()
+                return b"".join(chunks), trailers
+
+            def do_POST(self):
+                if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                    body, trailers = self._read_chunked()
+                else:
+                    length = int(self.headers.get("Content-Length", 0))
+                    body, trailers = self.rfile.read(length), {}
+                self.send_response(
+                    202 if self.path.startswith(_INVOCATION_PATH) else 404
+                )
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                if not api.record_bodies:
+                    body = len(body)
+                with api.posted:
+                    api.posts.append((self.path, dict(self.headers), body, trailers))
+                    api.posted.notify_all()
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.address = "127.0.0.1:%d" % self.server.server_address[1]
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        )
+
+    def add_event(self, body, request_id="request-id", deadline_ms=0, **headers):
+        headers = {
+            "Lambda-Runtime-Aws-Request-Id": request_id,
+            "Lambda-Runtime-Deadline-Ms": str(deadline_ms),
+            "Lambda-Runtime-Invoked-Function-Arn": "function-arn",
+            "Content-Type": "application/json",
+            **headers,
+        }
+        self.events.put((body, headers))
+
+    def wait_for_posts(self, count, timeout=5):
+        with self.posted:
+            self.posted.wait_for(lambda: len(self.posts) >= count, timeout)
+        return self.posts
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
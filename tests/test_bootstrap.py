@@ -2,13 +2,19 @@
 Copyright 2019 Amazon.com, Inc. or its affiliates. All Rights Reserved.
 """
 
+import asyncio
+import contextvars
 import importlib
+import io
 import json
 import logging
 import logging.config
+import mmap
 import os
 import re
+import sys
 import tempfile
+import threading
 import time
 import traceback
 import unittest
@@ -17,13 +23,21 @@ from tempfile import NamedTemporaryFile
 from unittest.mock import MagicMock, Mock, patch, ANY
 
 import awslambdaric.bootstrap as bootstrap
+from awslambdaric.lambda_runtime_client import InvocationRequest
+from awslambdaric import lambda_runtime_log_utils
 from awslambdaric.lambda_runtime_exception import FaultException
 from awslambdaric.lambda_runtime_log_utils import (
     LogFormat,
     _get_log_level_from_env_var,
     JsonFormatter,
+    LogRateLimiter,
+    TextFormatter,
+)
+from awslambdaric.lambda_runtime_marshaller import (
+    LambdaMarshaller,
+    LambdaResponse,
+    raw_payload,
 )
-from awslambdaric.lambda_runtime_marshaller import LambdaMarshaller
 from awslambdaric.lambda_literals import (
     lambda_unhandled_exception_warning_message,
 )
@@ -662,6 +676,392 @@ class TestHandleEventRequest(unittest.TestCase):
         self.assertEqual(stdout_value, error_logs)
 
 
+class TestStreamingResponse(unittest.TestCase):
+    def setUp(self):
+        self.lambda_runtime = Mock()
+        self.lambda_runtime.marshaller = LambdaMarshaller()
+        self.lambda_runtime.post_invocation_stream.side_effect = self.consume_stream
+        self.chunks = []
+        self.stream_error = None
+
+        logging.getLogger().handlers.clear()
+
+    def tearDown(self) -> None:
+        logging.getLogger().handlers.clear()
+        logging.getLogger().level = logging.NOTSET
+
+    def consume_stream(self, invoke_id, chunks, content_type, on_error):
+        try:
+            for chunk in chunks:
+                self.chunks.append(bytes(chunk))
+        except Exception:
+            self.stream_error = on_error(sys.exc_info())
+
+    def handle(self, handler):
+        bootstrap.handle_event_request(
+            self.lambda_runtime,
+            handler,
+            "invoke_id",
+            b"{}",
+            "application/json",
+            None,
+            None,
+            "invoked_function_arn",
+            0,
+            None,
+            bootstrap.StandardLogSink(),
+        )
+
+    def test_generator_response_is_streamed(self):
+        def handler(event, context):
+            yield "hello "
+            yield b"world"
+
+        self.handle(handler)
+
+        self.lambda_runtime.post_invocation_stream.assert_called_once_with(
+            "invoke_id", ANY, "application/octet-stream", ANY
+        )
+        self.lambda_runtime.post_invocation_result.assert_not_called()
+        self.assertEqual(b"".join(self.chunks), b"hello world")
+
+    def test_lambda_response_with_generator_body_is_streamed_with_its_content_type(
+        self,
+    ):
+        def events():
+            yield "data: hello\n\n"
+            yield "data: world\n\n"
+
+        self.handle(
+            lambda event, context: LambdaResponse(events(), "text/event-stream")
+        )
+
+        self.lambda_runtime.post_invocation_stream.assert_called_once_with(
+            "invoke_id", ANY, "text/event-stream", ANY
+        )
+        self.assertEqual(b"".join(self.chunks), b"data: hello\n\ndata: world\n\n")
+
+    def test_async_generator_response_is_streamed(self):
+        async def handler(event, context):
+            for chunk in (b"a", b"b", b"c"):
+                await asyncio.sleep(0)
+                yield chunk
+
+        self.handle(handler)
+
+        self.assertEqual(b"".join(self.chunks), b"abc")
+
+    def test_file_like_response_is_streamed_in_blocks(self):
+        payload = b"line\n" * 30000
+        stream = io.BytesIO(payload)
+
+        self.handle(lambda event, context: stream)
+
+        self.assertEqual(b"".join(self.chunks), payload)
+        self.assertLess(len(self.chunks), 10)
+        self.assertTrue(stream.closed)
+
+    def test_mmap_response_is_posted_as_binary(self):
+        mapped = mmap.mmap(-1, 4)
+        mapped.write(b"mmap")
+
+        self.handle(lambda event, context: mapped)
+
+        self.lambda_runtime.post_invocation_stream.assert_not_called()
+        self.lambda_runtime.post_invocation_result.assert_called_once_with(
+            "invoke_id", mapped, "application/unknown"
+        )
+        self.assertFalse(mapped.closed)
+
+    def test_error_before_first_chunk_posts_invocation_error(self):
+        def handler(event, context):
+            raise ValueError("early")
+            yield b"unreachable"
+
+        self.handle(handler)
+
+        self.lambda_runtime.post_invocation_stream.assert_not_called()
+        error_result = json.loads(
+            self.lambda_runtime.post_invocation_error.call_args[0][1]
+        )
+        self.assertEqual(error_result["errorType"], "ValueError")
+        self.assertEqual(error_result["errorMessage"], "early")
+
+    @patch("sys.stdout", new_callable=StringIO)
+    def test_error_mid_stream_is_reported_to_transport(self, mock_stdout):
+        def handler(event, context):
+            yield b"partial"
+            raise ValueError("late")
+
+        self.handle(handler)
+
+        self.assertEqual(self.chunks, [b"partial"])
+        error_type, error_body = self.stream_error
+        self.assertEqual(error_type, "ValueError")
+        error_result = json.loads(error_body)
+        self.assertEqual(error_result["errorMessage"], "late")
+        self.assertEqual(error_result["requestId"], "invoke_id")
+        self.assertIn("in handler", error_result["stackTrace"][-1])
+        self.assertIn("[ERROR] ValueError: late", mock_stdout.getvalue())
+        self.lambda_runtime.post_invocation_error.assert_not_called()
+
+    def test_invalid_chunk_type_is_reported(self):
+        def handler(event, context):
+            yield {"not": "bytes"}
+
+        self.handle(handler)
+
+        error_result = json.loads(
+            self.lambda_runtime.post_invocation_error.call_args[0][1]
+        )
+        self.assertEqual(error_result["errorType"], "TypeError")
+
+
+class TestAsyncHandler(unittest.TestCase):
+    def setUp(self):
+        self.lambda_runtime = Mock()
+        self.lambda_runtime.marshaller = LambdaMarshaller()
+
+    def tearDown(self):
+        if bootstrap._EVENT_LOOP is not None:
+            bootstrap._EVENT_LOOP.close()
+            bootstrap._EVENT_LOOP = None
+        asyncio.set_event_loop(None)
+
+    def handle(self, handler):
+        bootstrap.handle_event_request(
+            self.lambda_runtime,
+            handler,
+            "invoke_id",
+            b'"event"',
+            "application/json",
+            None,
+            None,
+            "invoked_function_arn",
+            0,
+            None,
+            bootstrap.StandardLogSink(),
+        )
+
+    def test_get_handler_wraps_coroutine_function(self):
+        async def handler(event, context):
+            return event
+
+        module = Mock(handler=handler)
+        with patch("importlib.import_module", return_value=module):
+            request_handler = bootstrap._get_handler("module.handler")
+
+        self.assertIsNot(request_handler, handler)
+        self.assertEqual(request_handler("event", None), "event")
+
+    def test_get_handler_keeps_sync_function(self):
+        def handler(event, context):
+            return event
+
+        module = Mock(handler=handler)
+        with patch("importlib.import_module", return_value=module):
+            self.assertIs(bootstrap._get_handler("module.handler"), handler)
+
+    def test_async_handler_runs_on_persistent_loop(self):
+        loops = []
+
+        async def handler(event, context):
+            loops.append(asyncio.get_running_loop())
+            return {"event": event}
+
+        request_handler = bootstrap._wrap_async_handler(handler)
+        self.handle(request_handler)
+        self.handle(request_handler)
+
+        self.assertIs(loops[0], loops[1])
+        self.assertFalse(loops[0].is_closed())
+        self.lambda_runtime.post_invocation_result.assert_called_with(
+            "invoke_id", '{"event": "event"}', "application/json"
+        )
+
+    def test_awaitable_returned_by_decorated_handler_is_awaited(self):
+        def decorator(func):
+            def wrapper(event, context):
+                return func(event, context)
+
+            return wrapper
+
+        @decorator
+        async def handler(event, context):
+            await asyncio.sleep(0)
+            return {"event": event}
+
+        module = Mock(handler=handler)
+        with patch("importlib.import_module", return_value=module):
+            self.handle(bootstrap._get_handler("module.handler"))
+
+        self.lambda_runtime.post_invocation_result.assert_called_once_with(
+            "invoke_id", '{"event": "event"}', "application/json"
+        )
+
+    def test_awaitable_returned_by_callable_instance_is_awaited(self):
+        class Handler(object):
+            async def __call__(self, event, context):
+                return {"event": event}
+
+        self.handle(Handler())
+
+        self.lambda_runtime.post_invocation_result.assert_called_once_with(
+            "invoke_id", '{"event": "event"}', "application/json"
+        )
+
+    def test_async_handler_error_trace_starts_in_handler(self):
+        async def handler(event, context):
+            await asyncio.sleep(0)
+            raise ValueError("async boom")
+
+        self.handle(bootstrap._wrap_async_handler(handler))
+
+        error_result = json.loads(
+            self.lambda_runtime.post_invocation_error.call_args[0][1]
+        )
+        self.assertEqual(error_result["errorType"], "ValueError")
+        self.assertEqual(len(error_result["stackTrace"]), 1)
+        self.assertIn("in handler", error_result["stackTrace"][0])
+
+    def test_background_tasks_progress_while_waiting_for_next_invocation(self):
+        ticks = []
+
+        async def background():
+            while True:
+                ticks.append(None)
+                await asyncio.sleep(0.001)
+
+        async def handler(event, context):
+            asyncio.get_running_loop().create_task(background())
+            return None
+
+        async def wait_next_invocation_async():
+            await asyncio.sleep(0.05)
+            raise SystemExit(0)
+
+        self.lambda_runtime.wait_next_invocation_async = wait_next_invocation_async
+        self.lambda_runtime.wait_next_invocation.return_value = InvocationRequest(
+            invoke_id="invoke_id",
+            x_amzn_trace_id=None,
+            invoked_function_arn="invoked_function_arn",
+            deadline_time_in_ms=0,
+            client_context=None,
+            cognito_identity=None,
+            tenant_id=None,
+            content_type="application/json",
+            event_body=b"{}",
+        )
+
+        with patch("awslambdaric.bootstrap._get_handler") as get_handler, patch(
+            "awslambdaric.bootstrap._setup_logging"
+        ), patch("sys.stdout"), patch("sys.stderr"):
+            get_handler.return_value = bootstrap._wrap_async_handler(handler)
+            with self.assertRaises(SystemExit):
+                bootstrap.run("module.handler", self.lambda_runtime)
+
+        self.lambda_runtime.wait_next_invocation.assert_called_once()
+        self.lambda_runtime.post_invocation_result.assert_called_once()
+        self.assertGreater(len(ticks), 5)
+
+
+class TestRawPayloadHandler(unittest.TestCase):
+    def setUp(self):
+        self.lambda_runtime = Mock()
+        self.lambda_runtime.marshaller = Mock()
+
+    def tearDown(self):
+        if bootstrap._EVENT_LOOP is not None:
+            bootstrap._EVENT_LOOP.close()
+            bootstrap._EVENT_LOOP = None
+        asyncio.set_event_loop(None)
+
+    def get_handler(self, handler):
+        module = Mock(handler=handler)
+        with patch("importlib.import_module", return_value=module):
+            return bootstrap._get_handler("module.handler")
+
+    def handle(self, handler, event_body=b"\x00\x01binary"):
+        bootstrap.handle_event_request(
+            self.lambda_runtime,
+            handler,
+            "invoke_id",
+            event_body,
+            "application/octet-stream",
+            None,
+            None,
+            "invoked_function_arn",
+            0,
+            None,
+            bootstrap.StandardLogSink(),
+        )
+
+    def test_raw_payload_bypasses_marshaller(self):
+        events = []
+
+        @raw_payload("image/png")
+        def handler(event, context):
+            events.append(event)
+            return memoryview(b"\x89PNG")
+
+        event_body = memoryview(b"\x00\x01binary")
+        self.handle(self.get_handler(handler), event_body)
+
+        self.assertIs(events[0], event_body)
+        self.lambda_runtime.marshaller.unmarshal_request.assert_not_called()
+        self.lambda_runtime.marshaller.marshal_response.assert_not_called()
+        (invoke_id, result, content_type), _ = (
+            self.lambda_runtime.post_invocation_result.call_args
+        )
+        self.assertEqual((invoke_id, bytes(result)), ("invoke_id", b"\x89PNG"))
+        self.assertEqual(content_type, "image/png")
+
+    def test_bare_decorator_defaults_to_octet_stream(self):
+        @raw_payload
+        def handler(event, context):
+            return b"data"
+
+        self.handle(self.get_handler(handler))
+
+        self.lambda_runtime.post_invocation_result.assert_called_once_with(
+            "invoke_id", b"data", "application/octet-stream"
+        )
+
+    def test_async_raw_payload_handler(self):
+        @raw_payload("text/plain")
+        async def handler(event, context):
+            return bytes(event).upper()
+
+        self.handle(self.get_handler(handler), b"abc")
+
+        self.lambda_runtime.post_invocation_result.assert_called_once_with(
+            "invoke_id", b"ABC", "text/plain"
+        )
+
+    def test_none_result_posts_empty_payload(self):
+        self.handle(self.get_handler(raw_payload(lambda event, context: None)))
+
+        self.lambda_runtime.post_invocation_result.assert_called_once_with(
+            "invoke_id", b"", "application/octet-stream"
+        )
+
+    def test_unsupported_result_is_marshal_error(self):
+        self.handle(self.get_handler(raw_payload(lambda event, context: {"a": 1})))
+
+        self.lambda_runtime.post_invocation_result.assert_not_called()
+        error_result = json.loads(
+            self.lambda_runtime.post_invocation_error.call_args[0][1]
+        )
+        self.assertEqual(error_result["errorType"], "Runtime.MarshalError")
+        self.assertIn("not dict", error_result["errorMessage"])
+
+    def test_undecorated_handler_is_not_wrapped(self):
+        def handler(event, context):
+            return event
+
+        self.assertIs(self.get_handler(handler), handler)
+
+
 class TestXrayFault(unittest.TestCase):
     def test_make_xray(self):
         class CustomException(Exception):
@@ -933,6 +1333,27 @@ class TestContentType(unittest.TestCase):
         self.assertEqual("invoke-id", invoke_id)
         self.assertEqual("Runtime.UnmarshalError", error_dict["errorType"])
 
+    def test_ndjson_request_typed_response(self):
+        bootstrap.handle_event_request(
+            lambda_runtime_client=self.lambda_runtime,
+            request_handler=lambda event, ctx: LambdaResponse(
+                [{"n": len(event)}], "application/x-ndjson"
+            ),
+            invoke_id="invoke-id",
+            event_body=b'{"a": 1}\n{"b": 2}\n',
+            content_type="application/x-ndjson",
+            client_context_json=None,
+            cognito_identity_json=None,
+            invoked_function_arn="invocation-arn",
+            epoch_deadline_time_in_ms=1415836801003,
+            tenant_id=None,
+            log_sink=bootstrap.StandardLogSink(),
+        )
+
+        self.lambda_runtime.post_invocation_result.assert_called_once_with(
+            "invoke-id", '{"n": 2}\n', "application/x-ndjson"
+        )
+
 
 class TestLogError(unittest.TestCase):
     @patch("sys.stdout", new_callable=StringIO)
@@ -1122,6 +1543,146 @@ class TestUnbuffered(unittest.TestCase):
         mock_stream.flush.assert_called_once()
 
 
+class TestBufferedStream(unittest.TestCase):
+    def setUp(self):
+        self.stream = MagicMock(wraps=StringIO())
+        self.buffered = bootstrap.BufferedStream(self.stream)
+
+    def test_writes_are_coalesced_until_flush(self):
+        for i in range(3):
+            print("line", i, file=self.buffered)
+        self.buffered.writelines(["a", "b\n"])
+
+        self.stream.write.assert_not_called()
+        self.buffered.flush()
+
+        self.stream.write.assert_called_once_with("line 0\nline 1\nline 2\nab\n")
+        self.stream.flush.assert_called_once()
+
+    @patch("awslambdaric.bootstrap._STREAM_FLUSH_BYTES", 16)
+    def test_whole_lines_are_written_past_size_threshold(self):
+        self.buffered.write("0123456789\n")
+        self.buffered.write("abcdef")
+
+        self.stream.write.assert_called_once_with("0123456789\n")
+        self.buffered.flush()
+        self.assertEqual(self.stream.getvalue(), "0123456789\nabcdef")
+
+    @patch("awslambdaric.bootstrap._STREAM_FLUSH_BYTES", 4)
+    def test_long_partial_line_is_written(self):
+        self.buffered.write("a\n0123456789")
+
+        self.stream.write.assert_called_once_with("a\n0123456789")
+
+    @patch("awslambdaric.bootstrap._STREAM_FLUSH_INTERVAL", 0.01)
+    def test_output_is_written_once_pending_long_enough_without_further_writes(self):
+        print("starting long job", file=self.buffered)
+        self.buffered.write("partial")
+
+        deadline = time.monotonic() + 5
+        while not self.stream.flush.called and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+        self.stream.write.assert_called_once_with("starting long job\npartial")
+        self.stream.flush.assert_called_once()
+
+    def test_flusher_thread_is_reused_across_flushes(self):
+        threads = set()
+        for i in range(3):
+            print("invocation", i, file=self.buffered)
+            self.buffered.flush()
+            threads.add(self.buffered._flusher._thread)
+
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads.pop().daemon)
+
+    def test_attributes_of_stream(self):
+        self.assertIs(self.buffered.getvalue, self.stream.getvalue)
+
+    def test_output_is_flushed_before_posting(self):
+        lambda_runtime = Mock()
+        lambda_runtime.marshaller = LambdaMarshaller()
+        posted_output = []
+        lambda_runtime.post_invocation_result.side_effect = (
+            lambda *args: posted_output.append(self.stream.getvalue())
+        )
+
+        with patch("sys.stdout", self.buffered):
+            bootstrap.handle_event_request(
+                lambda_runtime,
+                lambda event, context: print("printed"),
+                "invoke_id",
+                b"{}",
+                "application/json",
+                None,
+                None,
+                "invoked_function_arn",
+                0,
+                None,
+                bootstrap.StandardLogSink(),
+            )
+
+        self.assertEqual(posted_output, ["printed\n"])
+
+
+class TestLogSinkStream(unittest.TestCase):
+    def setUp(self):
+        self.log_sink = Mock()
+        self.stream = StringIO()
+        self.log_sink_stream = bootstrap.LogSinkStream(self.log_sink, self.stream)
+
+    def test_one_frame_per_print(self):
+        print("multi\nline", "output", file=self.log_sink_stream)
+        print("second", end="", file=self.log_sink_stream)
+        self.log_sink_stream.write("")
+
+        self.log_sink.log.assert_called_once_with("multi\nline output\n")
+        self.log_sink_stream.flush()
+        self.log_sink.log.assert_called_with("second")
+        self.assertEqual(self.stream.getvalue(), "")
+
+    @patch("awslambdaric.bootstrap._STREAM_FLUSH_BYTES", 4)
+    def test_long_partial_line_is_logged(self):
+        self.log_sink_stream.write("abcdef")
+
+        self.log_sink.log.assert_called_once_with("abcdef")
+
+    def test_output_goes_to_stream_once_log_sink_is_closed(self):
+        self.log_sink.log.side_effect = ValueError("I/O operation on closed file")
+
+        print("late", file=self.log_sink_stream)
+
+        self.assertEqual(self.stream.getvalue(), "late\n")
+
+    def test_printed_output_is_framed(self):
+        with NamedTemporaryFile() as temp_file:
+            with patch.dict(os.environ, {"AWS_LAMBDA_FRAMED_STDOUT": "true"}), patch(
+                "sys.stdout"
+            ), patch("sys.stderr"):
+                with bootstrap.FramedTelemetryLogSink(
+                    os.open(temp_file.name, os.O_CREAT | os.O_RDWR), batching=True
+                ) as log_sink:
+                    bootstrap._frame_output(log_sink)
+                    print("out\nput")
+                    print("error", file=sys.stderr)
+                    bootstrap._flush_output(log_sink)
+
+                    with open(temp_file.name, "rb") as f:
+                        content = f.read()
+
+        self.assertEqual(content[4:8], (8).to_bytes(4, "big"))
+        self.assertEqual(content[16:24], b"out\nput\n")
+        self.assertEqual(content[40:], b"error\n")
+
+    def test_output_is_not_framed_without_telemetry_log_sink(self):
+        with patch.dict(os.environ, {"AWS_LAMBDA_FRAMED_STDOUT": "true"}), patch(
+            "sys.stdout"
+        ) as stdout:
+            bootstrap._frame_output(bootstrap.StandardLogSink())
+
+            self.assertIs(sys.stdout, stdout)
+
+
 class TestLogSink(unittest.TestCase):
     @patch("sys.stdout", new_callable=StringIO)
     def test_create_unbuffered_log_sinks(self, mock_stdout):
@@ -1205,6 +1766,381 @@ class TestLogSink(unittest.TestCase):
 
                 self.assertEqual(content[pos:], b"")
 
+    def test_create_batching_framed_telemetry_log_sink(self):
+        with patch.dict(
+            os.environ,
+            {"_LAMBDA_TELEMETRY_LOG_FD": "3", "AWS_LAMBDA_LOG_BATCHING": "true"},
+        ):
+            actual = bootstrap.create_log_sink()
+
+        self.assertTrue(actual.batching)
+
+    def read_frames(self, content):
+        frames = []
+        pos = 0
+        while pos < len(content):
+            length = int.from_bytes(content[pos + 4 : pos + 8], "big")
+            frames.append(
+                (content[pos : pos + 4], content[pos + 16 : pos + 16 + length])
+            )
+            pos += 16 + length
+        return frames
+
+    def test_batched_frames_are_written_on_flush(self):
+        with NamedTemporaryFile() as temp_file:
+            with bootstrap.FramedTelemetryLogSink(
+                os.open(temp_file.name, os.O_CREAT | os.O_RDWR), batching=True
+            ) as ls:
+                ls.log("first\n")
+                ls.log_error(["error", "line"])
+                ls.log("")
+                self.assertEqual(os.path.getsize(temp_file.name), 0)
+                with patch("os.writev", wraps=os.writev) as writev:
+                    ls.flush()
+                writev.assert_called_once()
+                ls.log("after flush")
+
+            with open(temp_file.name, "rb") as f:
+                frames = self.read_frames(f.read())
+
+        self.assertEqual(
+            frames,
+            [
+                (b"\xa5\x5a\x00\x03", b"first\n"),
+                (b"\xa5\x5a\x00\x17", b"error\nline"),
+                (b"\xa5\x5a\x00\x03", b""),
+                (b"\xa5\x5a\x00\x03", b"after flush"),
+            ],
+        )
+
+    @patch("awslambdaric.bootstrap._LOG_BATCH_MAX_FRAMES", 3)
+    def test_batch_is_written_when_full(self):
+        with NamedTemporaryFile() as temp_file:
+            with bootstrap.FramedTelemetryLogSink(
+                os.open(temp_file.name, os.O_CREAT | os.O_RDWR), batching=True
+            ) as ls:
+                for i in range(4):
+                    ls.log(str(i))
+                with open(temp_file.name, "rb") as f:
+                    self.assertEqual(len(self.read_frames(f.read())), 3)
+
+            with open(temp_file.name, "rb") as f:
+                self.assertEqual(len(self.read_frames(f.read())), 4)
+
+    @patch("awslambdaric.bootstrap._LOG_BATCH_FLUSH_INTERVAL", 0.01)
+    def test_batch_is_written_once_held_long_enough(self):
+        with NamedTemporaryFile() as temp_file:
+            with bootstrap.FramedTelemetryLogSink(
+                os.open(temp_file.name, os.O_CREAT | os.O_RDWR), batching=True
+            ) as ls:
+                ls.log("before hanging")
+
+                deadline = time.monotonic() + 5
+                while (
+                    not os.path.getsize(temp_file.name) and time.monotonic() < deadline
+                ):
+                    time.sleep(0.005)
+                with open(temp_file.name, "rb") as f:
+                    frames = self.read_frames(f.read())
+
+        self.assertEqual(frames, [(b"\xa5\x5a\x00\x03", b"before hanging")])
+
+    def test_closed_batching_sink_raises_on_write(self):
+        with NamedTemporaryFile() as temp_file:
+            with bootstrap.FramedTelemetryLogSink(
+                os.open(temp_file.name, os.O_CREAT | os.O_RDWR), batching=True
+            ) as ls:
+                pass
+            stream = StringIO()
+            print("traceback", file=bootstrap.LogSinkStream(ls, stream))
+
+            with self.assertRaises(ValueError):
+                ls.log("late")
+        self.assertEqual(stream.getvalue(), "traceback\n")
+
+    def test_batch_survives_partial_writes(self):
+        real_writev = os.writev
+
+        def writev(fd, buffers):
+            # Writes at most 5 bytes at a time.
+            return real_writev(fd, [b"".join(buffers)[:5]])
+
+        with NamedTemporaryFile() as temp_file:
+            with bootstrap.FramedTelemetryLogSink(
+                os.open(temp_file.name, os.O_CREAT | os.O_RDWR), batching=True
+            ) as ls:
+                ls.log("hello")
+                ls.log("world")
+                with patch("os.writev", side_effect=writev):
+                    ls.flush()
+
+            with open(temp_file.name, "rb") as f:
+                frames = self.read_frames(f.read())
+
+        self.assertEqual([message for _, message in frames], [b"hello", b"world"])
+
+    def test_log_sink_is_flushed_before_posting(self):
+        calls = Mock()
+        calls.lambda_runtime.marshaller = LambdaMarshaller()
+
+        for handler in (lambda event, context: None, lambda event, context: 1 / 0):
+            with self.subTest(handler=handler):
+                calls.reset_mock()
+                bootstrap.handle_event_request(
+                    calls.lambda_runtime,
+                    handler,
+                    "invoke_id",
+                    b"{}",
+                    "application/json",
+                    None,
+                    None,
+                    "invoked_function_arn",
+                    0,
+                    None,
+                    calls.log_sink,
+                )
+
+                names = [name for name, _, _ in calls.mock_calls]
+                self.assertEqual(names[-2], "log_sink.flush")
+                self.assertRegex(names[-1], "lambda_runtime.post_invocation_")
+
+
+class RecordingLogSink(object):
+    def __init__(self):
+        self.frames = []
+        self.threads = set()
+        self.writing = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.closed = True
+
+    def _frame(self, msg, frame_type=None):
+        return msg
+
+    def _write(self, frame):
+        self.writing.set()
+        self.gate.wait(5)
+        self.threads.add(threading.current_thread().name)
+        self.frames.append(frame)
+
+    def log(self, msg, frame_type=None):
+        self._write(msg)
+
+    def log_error(self, message_lines):
+        self._write("|".join(message_lines))
+
+    def flush(self):
+        pass
+
+
+class TestAsyncLogSink(unittest.TestCase):
+    def setUp(self):
+        self.sink = RecordingLogSink()
+
+    def test_frames_are_written_in_order_by_writer_thread(self):
+        with bootstrap.AsyncLogSink(self.sink, capacity=2) as ls:
+            for i in range(10):
+                ls.log(str(i))
+            ls.log_error(["error", "line"])
+            ls.flush()
+
+            self.assertEqual(
+                self.sink.frames, [str(i) for i in range(10)] + ["error|line"]
+            )
+            self.assertEqual(self.sink.threads, {"lambda-log-writer"})
+            self.assertEqual(ls.dropped, 0)
+
+    def test_leaving_drains_queue(self):
+        self.sink.gate.clear()
+        with bootstrap.AsyncLogSink(self.sink) as ls:
+            ls.log("first")
+            ls.log("second")
+            self.sink.gate.set()
+
+        self.assertEqual(self.sink.frames, ["first", "second"])
+        self.assertTrue(self.sink.closed)
+        ls.log("after close")
+        self.assertEqual(self.sink.frames[-1], "after close")
+
+    def fill_while_writer_is_blocked(self, ls, count):
+        self.sink.gate.clear()
+        ls.log("0")
+        self.sink.writing.wait(5)
+        for i in range(1, count):
+            ls.log(str(i))
+        self.sink.gate.set()
+        ls.flush()
+
+    def test_drop_oldest_overflow(self):
+        with bootstrap.AsyncLogSink(
+            self.sink, capacity=2, overflow="drop-oldest"
+        ) as ls:
+            self.fill_while_writer_is_blocked(ls, 6)
+
+        self.assertEqual(ls.dropped, 3)
+        self.assertEqual(self.sink.frames[:3], ["0", "4", "5"])
+        self.assertIn("3 log messages were dropped", self.sink.frames[3])
+
+    def test_drop_overflow(self):
+        with bootstrap.AsyncLogSink(self.sink, capacity=2, overflow="drop") as ls:
+            self.fill_while_writer_is_blocked(ls, 6)
+
+        self.assertEqual(ls.dropped, 3)
+        self.assertEqual(self.sink.frames[:3], ["0", "1", "2"])
+        self.assertIn("3 log messages were dropped", self.sink.frames[3])
+
+    def test_drop_oldest_overflow_keeps_errors(self):
+        with bootstrap.AsyncLogSink(
+            self.sink, capacity=2, overflow="drop-oldest"
+        ) as ls:
+            self.sink.gate.clear()
+            ls.log("0")
+            self.sink.writing.wait(5)
+            ls.log_error(["error"])
+            for i in range(1, 4):
+                ls.log(str(i))
+            self.sink.gate.set()
+            ls.flush()
+
+        self.assertEqual(ls.dropped, 2)
+        self.assertEqual(self.sink.frames[:3], ["0", "error", "3"])
+
+    def test_drop_overflow_keeps_errors(self):
+        with bootstrap.AsyncLogSink(self.sink, capacity=1, overflow="drop") as ls:
+            self.sink.gate.clear()
+            ls.log("0")
+            self.sink.writing.wait(5)
+            ls.log("1")
+            ls.log_error(["error"])
+            self.sink.gate.set()
+            ls.flush()
+
+        self.assertEqual(ls.dropped, 0)
+        self.assertEqual(self.sink.frames, ["0", "1", "error"])
+
+    def test_failed_writes_are_counted_as_dropped(self):
+        def failing_write(frame):
+            raise OSError("write failed")
+
+        with bootstrap.AsyncLogSink(self.sink) as ls:
+            self.sink.gate.clear()
+            ls.log("0")
+            self.sink.writing.wait(5)
+            ls._enqueue(failing_write, "lost")
+            ls.log("1")
+            self.sink.gate.set()
+            ls.flush()
+
+        self.assertEqual(ls.dropped, 1)
+        self.assertEqual(self.sink.frames[:2], ["0", "1"])
+        self.assertIn("1 log messages were dropped", self.sink.frames[2])
+
+    def test_broken_sink_does_not_stall_flush(self):
+        class BrokenLogSink(RecordingLogSink):
+            def _write(self, *args, **kwargs):
+                raise OSError("broken pipe")
+
+            log = flush = _write
+
+        errors = []
+
+        def flush():
+            try:
+                ls.flush()
+            except OSError as e:
+                errors.append(e)
+
+        self.sink = BrokenLogSink()
+        with bootstrap.AsyncLogSink(self.sink, capacity=1) as ls:
+            for i in range(5):
+                ls.log(str(i))
+            flushed = threading.Thread(target=flush)
+            flushed.start()
+            flushed.join(5)
+
+            self.assertFalse(flushed.is_alive())
+            self.assertTrue(ls._thread.is_alive())
+        self.assertEqual(ls.dropped, 5)
+        # Like a synchronous sink, flush() itself still reports the broken sink to its caller.
+        self.assertEqual(len(errors), 1)
+
+    def test_flush_does_not_wait_for_dead_writer_thread(self):
+        class DyingLogSink(RecordingLogSink):
+            def flush(self):
+                if threading.current_thread().name == "lambda-log-writer":
+                    raise SystemExit()
+
+        self.sink = DyingLogSink()
+        with patch("threading.excepthook"), bootstrap.AsyncLogSink(self.sink) as ls:
+            ls.log("first")
+            ls._thread.join(5)
+            flushed = threading.Thread(target=ls.flush)
+            flushed.start()
+            flushed.join(5)
+
+            self.assertFalse(flushed.is_alive())
+            ls.log("second")
+        self.assertEqual(self.sink.frames, ["first", "second"])
+
+    def test_block_overflow_waits_for_room(self):
+        self.sink.gate.clear()
+        with bootstrap.AsyncLogSink(self.sink, capacity=1, overflow="block") as ls:
+            logger = threading.Thread(target=lambda: [ls.log(str(i)) for i in range(4)])
+            logger.start()
+            self.sink.writing.wait(5)
+            logger.join(0.05)
+            # "0" is being written and "1" fills the ring, so logging "2" waits.
+            self.assertTrue(logger.is_alive())
+            self.sink.gate.set()
+            logger.join(5)
+            ls.flush()
+
+        self.assertEqual(self.sink.frames, ["0", "1", "2", "3"])
+        self.assertEqual(ls.dropped, 0)
+
+    def test_unknown_overflow_policy(self):
+        with self.assertRaises(ValueError):
+            bootstrap.AsyncLogSink(self.sink, overflow="spill")
+
+    @patch.dict(
+        os.environ,
+        {
+            "AWS_LAMBDA_ASYNC_LOGGING": "true",
+            "AWS_LAMBDA_LOG_QUEUE_SIZE": "16",
+            "AWS_LAMBDA_LOG_OVERFLOW": "drop",
+        },
+    )
+    def test_create_async_log_sink(self):
+        os.environ.pop("_LAMBDA_TELEMETRY_LOG_FD", None)
+
+        actual = bootstrap.create_log_sink()
+
+        self.assertIsInstance(actual, bootstrap.AsyncLogSink)
+        self.assertIsInstance(actual.sink, bootstrap.StandardLogSink)
+        self.assertEqual((actual.capacity, actual.overflow), (16, "drop"))
+
+    def test_framed_frames_keep_logging_timestamp(self):
+        with NamedTemporaryFile() as temp_file:
+            framed = bootstrap.FramedTelemetryLogSink(
+                os.open(temp_file.name, os.O_CREAT | os.O_RDWR)
+            )
+            before = int(time.time_ns() / 1000)
+            with bootstrap.AsyncLogSink(framed) as ls:
+                ls.log("message")
+                after = int(time.time_ns() / 1000)
+                time.sleep(0.01)
+            with open(temp_file.name, "rb") as f:
+                content = f.read()
+
+        self.assertEqual(content[16:], b"message")
+        self.assertTrue(before <= int.from_bytes(content[8:16], "big") <= after)
+
 
 class TestLoggingSetup(unittest.TestCase):
     def test_log_level(self) -> None:
@@ -1292,6 +2228,337 @@ class TestLambdaLoggerHandlerSetup(unittest.TestCase):
                 self.assertTrue(timestamp <= after)
 
 
+class TestTextFormatter(unittest.TestCase):
+    def make_record(self, **kwargs):
+        record = logging.LogRecord(
+            "a.b", logging.WARNING, "app.py", 1, "hello %s", ("world",), **kwargs
+        )
+        record.aws_request_id = "request-id"
+        return record
+
+    def test_matches_stock_formatter(self):
+        stock = logging.Formatter(
+            "[%(levelname)s]\t%(asctime)s.%(msecs)03dZ\t%(aws_request_id)s\t%(message)s\n",
+            "%Y-%m-%dT%H:%M:%S",
+        )
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            exc_info = sys.exc_info()
+
+        for kwargs in (
+            {"exc_info": None},
+            {"exc_info": exc_info},
+            {"exc_info": exc_info, "sinfo": "Stack (most recent call last):"},
+        ):
+            with self.subTest(kwargs=kwargs):
+                record = self.make_record(**kwargs)
+                expected = stock.format(record)
+                record.exc_text = record.message = None
+
+                self.assertEqual(TextFormatter().format(record), expected)
+                self.assertEqual(record.message, "hello world")
+
+    def test_timestamp_is_cached_per_second(self):
+        formatter = TextFormatter()
+        formatter.converter = time.gmtime
+        record = self.make_record(exc_info=None)
+
+        lines = []
+        with patch.object(
+            formatter, "formatTime", wraps=formatter.formatTime
+        ) as format_time:
+            for created in (0.25, 0.5, 1.0):
+                record.created = created
+                record.msecs = created % 1 * 1000
+                lines.append(formatter.format(record))
+
+        self.assertEqual(
+            [line.split("\t")[1] for line in lines],
+            [
+                "1970-01-01T00:00:00.250Z",
+                "1970-01-01T00:00:00.500Z",
+                "1970-01-01T00:00:01.000Z",
+            ],
+        )
+        self.assertEqual(format_time.call_count, 2)
+
+    def test_setup_logging_selects_text_formatter(self):
+        logger = logging.getLogger()
+        handlers = logger.handlers[:]
+        try:
+            bootstrap._setup_logging(
+                LogFormat.from_str("TEXT"), "", bootstrap.StandardLogSink()
+            )
+            self.assertIsInstance(logger.handlers[-1].formatter, TextFormatter)
+        finally:
+            logger.handlers[:] = handlers
+
+
+class TestLogRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.log_sink = Mock()
+        self.logger = logging.Logger("rate.limited", logging.DEBUG)
+
+    def make_handler(self, limiter, formatter=None):
+        handler = bootstrap.LambdaLoggerHandlerWithFrameType(self.log_sink)
+        handler.setFormatter(formatter or TextFormatter())
+        limiter.attach(handler)
+        handler.addFilter(bootstrap.LambdaLoggerFilter())
+        self.logger.addHandler(handler)
+        limiter.start_invocation("request-id")
+        return handler
+
+    def logged(self):
+        return [c.args[0].split("\t")[-1] for c in self.log_sink.log.call_args_list]
+
+    def test_from_env(self):
+        self.assertIsNone(LogRateLimiter.from_env({}))
+        limiter = LogRateLimiter.from_env(
+            {
+                "AWS_LAMBDA_LOG_MAX_RECORDS": "100",
+                "AWS_LAMBDA_LOG_MAX_BYTES": "invalid",
+                "AWS_LAMBDA_LOG_SAMPLING": "debug=0.1, TRACE=0.2,INFO=0.5,WARNING=2,X=1",
+                "AWS_LAMBDA_LOG_BURST": "10",
+            }
+        )
+
+        self.assertEqual(limiter.max_records, 100)
+        self.assertIsNone(limiter.max_bytes)
+        self.assertEqual(limiter.sampling, {logging.DEBUG: 0.2, logging.INFO: 0.5})
+        self.assertEqual(limiter.burst, 10)
+
+    def test_max_records_per_invocation(self):
+        limiter = LogRateLimiter(max_records=2)
+        self.make_handler(limiter)
+
+        for i in range(5):
+            self.logger.info("record %d", i)
+        limiter.report()
+        limiter.start_invocation("next-request-id")
+        self.logger.info("next invocation")
+
+        self.assertEqual(
+            self.logged(),
+            [
+                "record 0\n",
+                "record 1\n",
+                "3 log records were suppressed by the log rate limit\n",
+                "next invocation\n",
+            ],
+        )
+        self.assertIn("\trequest-id\t", self.log_sink.log.call_args_list[2].args[0])
+
+    def test_max_bytes_per_invocation(self):
+        limiter = LogRateLimiter(max_bytes=10)
+        self.make_handler(limiter)
+
+        self.logger.info("first")
+        self.logger.info("second")
+
+        self.assertEqual(self.logged(), ["first\n"])
+        self.assertEqual(limiter.suppressed, 1)
+
+    def test_max_bytes_counts_encoded_size(self):
+        limiter = LogRateLimiter(max_bytes=50)
+        self.make_handler(limiter, logging.Formatter("%(message)s"))
+
+        self.logger.info("\U0001f600" * 10)
+        self.logger.info("caf\u00e9")
+        self.assertEqual(limiter.bytes, 45)
+        self.logger.info("second")
+        self.logger.info("third")
+
+        self.assertEqual(limiter.bytes, 51)
+        self.assertEqual(limiter.suppressed, 1)
+
+    def test_sampling_after_burst(self):
+        limiter = LogRateLimiter(sampling={logging.DEBUG: 0.25}, burst=2)
+        self.make_handler(limiter)
+
+        for i in range(10):
+            self.logger.debug("debug %d", i)
+        self.logger.error("error")
+
+        self.assertEqual(
+            self.logged(),
+            ["debug 0\n", "debug 1\n", "debug 5\n", "debug 9\n", "error\n"],
+        )
+        self.assertEqual(limiter.suppressed, 6)
+
+    def test_suppressed_records_are_not_formatted(self):
+        limiter = LogRateLimiter(max_records=0)
+        formatter = Mock(wraps=TextFormatter())
+        self.make_handler(limiter, formatter)
+
+        self.logger.info("suppressed")
+
+        formatter.format.assert_not_called()
+
+    def test_json_report(self):
+        limiter = LogRateLimiter(max_records=0)
+        self.make_handler(limiter, JsonFormatter())
+        self.logger.info("suppressed")
+
+        limiter.report()
+        limiter.report()
+
+        self.log_sink.log.assert_called_once()
+        report = json.loads(self.log_sink.log.call_args.args[0])
+        self.assertEqual(report["level"], "WARNING")
+        self.assertEqual(report["requestId"], "request-id")
+        self.assertEqual(report["suppressedRecords"], 1)
+
+    @patch.dict(os.environ, {"AWS_LAMBDA_LOG_MAX_RECORDS": "1"})
+    def test_setup_logging_attaches_rate_limiter(self):
+        logger = logging.getLogger()
+        handlers = logger.handlers[:]
+        try:
+            bootstrap._setup_logging(LogFormat.from_str("TEXT"), "", self.log_sink)
+            handler = logger.handlers[-1]
+
+            self.assertIs(handler.rate_limiter, bootstrap._LOG_RATE_LIMITER)
+            self.assertIs(handler.filters[0], bootstrap._LOG_RATE_LIMITER)
+        finally:
+            logger.handlers[:] = handlers
+            bootstrap._LOG_RATE_LIMITER = None
+
+
+class TestInvocationIdentity(unittest.TestCase):
+    def setUp(self):
+        self.factory = bootstrap._LambdaLogRecordFactory(logging.LogRecord)
+
+    def make_record(self):
+        return self.factory("test", logging.INFO, __file__, 1, "message", (), None)
+
+    def make_record_in(self, request_id, tenant_id):
+        context = contextvars.copy_context()
+        context.run(bootstrap._INVOCATION_IDENTITY.set, (request_id, tenant_id))
+        return context.run(self.make_record)
+
+    def test_record_factory_attaches_invocation_identity(self):
+        record = self.make_record_in("request-id", "tenant-id")
+
+        self.assertEqual(record._lambda_identity, ("request-id", "tenant-id"))
+
+    @patch("awslambdaric.bootstrap._GLOBAL_TENANT_ID", "global-tenant-id")
+    @patch("awslambdaric.bootstrap._GLOBAL_AWS_REQUEST_ID", "global-request-id")
+    def test_record_factory_falls_back_to_global_identity(self):
+        record = self.make_record()
+
+        self.assertEqual(
+            record._lambda_identity, ("global-request-id", "global-tenant-id")
+        )
+
+    def test_concurrent_invocations_keep_their_own_identity(self):
+        barrier = threading.Barrier(2)
+        records = {}
+
+        def invoke(request_id):
+            bootstrap._INVOCATION_IDENTITY.set((request_id, None))
+            barrier.wait()
+            records[request_id] = self.make_record()
+
+        threads = [
+            threading.Thread(target=contextvars.copy_context().run, args=(invoke, i))
+            for i in ("request-1", "request-2")
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(records["request-1"]._lambda_identity[0], "request-1")
+        self.assertEqual(records["request-2"]._lambda_identity[0], "request-2")
+
+    def log_through_handler(self, record_factory, *args, **kwargs):
+        log_sink = Mock()
+        logger = logging.Logger("identity", logging.INFO)
+        handler = bootstrap.LambdaLoggerHandler(log_sink)
+        handler.setFormatter(TextFormatter())
+        logger.addHandler(handler)
+        previous_factory = logging.getLogRecordFactory()
+        logging.setLogRecordFactory(record_factory)
+        try:
+            context = contextvars.copy_context()
+            context.run(bootstrap._INVOCATION_IDENTITY.set, ("request-id", None))
+            context.run(logger.info, *args, **kwargs)
+        finally:
+            logging.setLogRecordFactory(previous_factory)
+        return log_sink.log.call_args[0][0]
+
+    def test_extra_fields_named_like_the_identity_do_not_fail(self):
+        line = self.log_through_handler(
+            self.factory,
+            "message",
+            extra={"aws_request_id": "user-request-id", "tenant_id": "user-tenant"},
+        )
+
+        self.assertIn("\trequest-id\tmessage", line)
+
+    def test_records_from_a_replaced_factory_keep_the_request_id(self):
+        line = self.log_through_handler(logging.LogRecord, "message")
+
+        self.assertIn("\trequest-id\tmessage", line)
+
+    def test_setup_logging_installs_record_factory_once(self):
+        record_factory = logging.getLogRecordFactory()
+        root_logger = logging.getLogger()
+        handlers = root_logger.handlers[:]
+        try:
+            logging.setLogRecordFactory(logging.LogRecord)
+            for _ in range(2):
+                bootstrap._setup_logging(
+                    LogFormat.TEXT, None, bootstrap.StandardLogSink()
+                )
+
+            installed = logging.getLogRecordFactory()
+            self.assertIsInstance(installed, bootstrap._LambdaLogRecordFactory)
+            self.assertIs(installed.factory, logging.LogRecord)
+            self.assertEqual(root_logger.handlers[-1].filters, [])
+        finally:
+            logging.setLogRecordFactory(record_factory)
+            root_logger.handlers[:] = handlers
+
+    @patch("awslambdaric.bootstrap._GLOBAL_TENANT_ID", None)
+    @patch("awslambdaric.bootstrap._GLOBAL_AWS_REQUEST_ID", None)
+    def test_run_handles_each_invocation_in_its_own_context(self):
+        identities = []
+        lambda_runtime = Mock()
+        lambda_runtime.wait_next_invocation.side_effect = [
+            InvocationRequest(
+                invoke_id="request-%d" % i,
+                x_amzn_trace_id=None,
+                invoked_function_arn="invoked_function_arn",
+                deadline_time_in_ms=0,
+                client_context=None,
+                cognito_identity=None,
+                tenant_id="tenant-%d" % i,
+                content_type="application/json",
+                event_body=b"{}",
+            )
+            for i in range(2)
+        ] + [SystemExit(0)]
+
+        with patch("awslambdaric.bootstrap._get_handler"), patch(
+            "awslambdaric.bootstrap._setup_logging"
+        ), patch("awslambdaric.bootstrap.handle_event_request") as handle, patch(
+            "sys.stdout"
+        ), patch(
+            "sys.stderr"
+        ):
+            handle.side_effect = lambda *_: identities.append(
+                bootstrap._INVOCATION_IDENTITY.get()
+            )
+            with self.assertRaises(SystemExit):
+                bootstrap.run("module.handler", lambda_runtime)
+
+        self.assertEqual(
+            identities, [("request-0", "tenant-0"), ("request-1", "tenant-1")]
+        )
+        self.assertIsNone(bootstrap._INVOCATION_IDENTITY.get(None))
+
+
 class TestLogging(unittest.TestCase):
     @classmethod
     def setUpClass(cls) -> None:
@@ -1350,6 +2617,63 @@ class TestLogging(unittest.TestCase):
                     )
         self.assertEqual(mock_stderr.getvalue(), "")
 
+    def test_json_formatter_extra_fields(self):
+        record = logging.LogRecord("a.b", logging.INFO, "app.py", 1, "msg", (), None)
+        record.aws_request_id = "request-id"
+        record.orderId = 1234
+        record.missing = None
+        record.level = "overridden"
+        record.stackTrace = "overridden"
+
+        data = json.loads(JsonFormatter().format(record))
+        data.pop("timestamp")
+
+        self.assertEqual(
+            data,
+            {
+                "level": "INFO",
+                "logger": "a.b",
+                "message": "msg",
+                "requestId": "request-id",
+                "orderId": 1234,
+            },
+        )
+
+    def test_json_formatter_task_name(self):
+        record = logging.LogRecord("a.b", logging.INFO, "app.py", 1, "msg", (), None)
+        record.aws_request_id = "request-id"
+        # Set by LogRecord itself since Python 3.12.
+        record.taskName = None
+        self.assertFalse(
+            record.__dict__.keys() - lambda_runtime_log_utils._RECORD_FIELDS
+        )
+
+        data = json.loads(JsonFormatter().format(record))
+        self.assertNotIn("taskName", data)
+
+        record.taskName = "Task-1"
+        data = json.loads(JsonFormatter().format(record))
+        self.assertEqual(data["taskName"], "Task-1")
+
+    def test_json_formatter_timestamp_is_cached_per_second(self):
+        formatter = JsonFormatter()
+        formatter.converter = time.gmtime
+        record = logging.LogRecord("a.b", logging.INFO, "app.py", 1, "msg", (), None)
+
+        timestamps = []
+        with patch.object(
+            formatter, "formatTime", wraps=formatter.formatTime
+        ) as format_time:
+            for created in (0.1, 0.9, 1.0, 1.5):
+                record.created = created
+                timestamps.append(json.loads(formatter.format(record))["timestamp"])
+
+        self.assertEqual(
+            timestamps,
+            ["1970-01-01T00:00:00Z"] * 2 + ["1970-01-01T00:00:01Z"] * 2,
+        )
+        self.assertEqual(format_time.call_count, 2)
+
     @patch("awslambdaric.bootstrap._GLOBAL_TENANT_ID", "test-tenant-id")
     @patch("sys.stderr", new_callable=StringIO)
     def test_json_formatter_with_tenant_id(self, mock_stderr):
@@ -2,6 +2,7 @@
 Copyright 2019 Amazon.com, Inc. or its affiliates. All Rights Reserved.
 """
 
+import asyncio
 import http
 import http.client
 import unittest.mock
@@ -11,12 +12,15 @@ from unittest.mock import MagicMock, patch
 from awslambdaric import __version__
 from awslambdaric.lambda_runtime_client import (
     InvocationRequest,
+    NextInvocationPoller,
     LambdaRuntimeClient,
     LambdaMultiConcurrentRuntimeClient,
     LambdaRuntimeClientError,
     _user_agent,
 )
-from awslambdaric.lambda_runtime_marshaller import to_json
+from awslambdaric.lambda_runtime_exception import FaultException
+from awslambdaric.lambda_runtime_marshaller import LambdaMarshaller, to_json
+from awslambdaric.lambda_runtime_socket_client import PostError
 
 
 class TestInvocationRequest(unittest.TestCase):
@@ -63,21 +67,23 @@ class TestInvocationRequest(unittest.TestCase):
 
 
 class TestLambdaRuntime(unittest.TestCase):
-    get_next_headers = {
-        "Lambda-Runtime-Aws-Request-Id": "RID1234",
-        "Lambda-Runtime-Trace-Id": "TID1234",
-        "Lambda-Runtime-Invoked-Function-Arn": "FARN1234",
-        "Lambda-Runtime-Deadline-Ms": 12,
-        "Lambda-Runtime-Client-Context": "client_context",
-        "Lambda-Runtime-Cognito-Identity": "cognito_identity",
-        "Lambda-Runtime-Aws-Tenant-Id": "tenant_id",
-        "Content-Type": "application/json",
-    }
+    def next_invocation(self, event_body=b"{}", tenant_id="tenant_id"):
+        return InvocationRequest(
+            invoke_id="RID1234",
+            x_amzn_trace_id="TID1234",
+            invoked_function_arn="FARN1234",
+            deadline_time_in_ms=12,
+            client_context="client_context",
+            cognito_identity="cognito_identity",
+            tenant_id=tenant_id,
+            content_type="application/json",
+            event_body=event_body,
+        )
 
     @patch("awslambdaric.lambda_runtime_client.runtime_client")
     def test_wait_next_invocation(self, mock_runtime_client):
         response_body = b"{}"
-        mock_runtime_client.next.return_value = response_body, self.get_next_headers
+        mock_runtime_client.next.return_value = self.next_invocation(response_body)
         runtime_client = LambdaRuntimeClient("localhost:1234")
 
         event_request = runtime_client.wait_next_invocation()
@@ -109,6 +115,63 @@ class TestLambdaRuntime(unittest.TestCase):
         self.assertEqual(event_request.content_type, "application/json")
         self.assertEqual(event_request.event_body, response_body)
 
+    @patch("awslambdaric.lambda_runtime_client.runtime_client")
+    def test_wait_next_invocation_keeps_memoryview_payload(self, mock_runtime_client):
+        response_body = memoryview(b"{}")
+        mock_runtime_client.next.return_value = self.next_invocation(response_body)
+        runtime_client = LambdaRuntimeClient("localhost:1234")
+
+        event_request = runtime_client.wait_next_invocation()
+
+        self.assertIs(event_request.event_body, response_body)
+
+    @patch("awslambdaric.lambda_runtime_client.runtime_client")
+    def test_wait_next_invocation_copies_payload_for_custom_marshaller(
+        self, mock_runtime_client
+    ):
+        class CustomMarshaller(LambdaMarshaller):
+            def unmarshal_request(self, request, content_type="application/json"):
+                return request.decode()
+
+        mock_runtime_client.next.return_value = self.next_invocation(memoryview(b"{}"))
+        runtime_client = LambdaRuntimeClient("localhost:1234")
+        runtime_client.marshaller = CustomMarshaller()
+
+        event_request = runtime_client.wait_next_invocation()
+
+        self.assertEqual(event_request.event_body, b"{}")
+        self.assertIsInstance(event_request.event_body, bytes)
+
+    @patch("awslambdaric.lambda_runtime_client.runtime_client")
+    def test_wait_next_invocation_returns_transport_request(self, mock_runtime_client):
+        invocation_request = InvocationRequest(
+            "RID1234", None, "FARN1234", 12, None, None, None, None, memoryview(b"{}")
+        )
+        mock_runtime_client.next.return_value = invocation_request
+        runtime_client = LambdaRuntimeClient("localhost:1234")
+
+        self.assertIs(runtime_client.wait_next_invocation(), invocation_request)
+
+    @patch("awslambdaric.lambda_runtime_client.runtime_client")
+    def test_wait_next_invocation_copies_transport_payload_for_custom_marshaller(
+        self, mock_runtime_client
+    ):
+        class CustomMarshaller(LambdaMarshaller):
+            def unmarshal_request(self, request, content_type="application/json"):
+                return request.decode()
+
+        mock_runtime_client.next.return_value = InvocationRequest(
+            "RID1234", None, "FARN1234", 12, None, None, None, None, memoryview(b"{}")
+        )
+        runtime_client = LambdaRuntimeClient("localhost:1234")
+        runtime_client.marshaller = CustomMarshaller()
+
+        event_request = runtime_client.wait_next_invocation()
+
+        self.assertEqual(event_request.invoke_id, "RID1234")
+        self.assertEqual(event_request.event_body, b"{}")
+        self.assertIsInstance(event_request.event_body, bytes)
+
     @patch("awslambdaric.lambda_runtime_client.runtime_client")
     def test_wait_next_invocation_calls_next_from_separate_thread(
         self, mock_runtime_client
@@ -117,7 +180,7 @@ class TestLambdaRuntime(unittest.TestCase):
 
         def record_thread_id():
             thread_ids.append(threading.get_ident())
-            return b"{}", self.get_next_headers
+            return self.next_invocation()
 
         mock_runtime_client.next.side_effect = record_thread_id
 
@@ -133,19 +196,103 @@ class TestLambdaRuntime(unittest.TestCase):
             "runtime_client.next() was not called from a separate thread",
         )
 
+    @patch("awslambdaric.lambda_runtime_client.runtime_client")
+    def test_wait_next_invocation_reuses_polling_thread(self, mock_runtime_client):
+        thread_ids = []
+
+        def record_thread_id():
+            thread_ids.append(threading.get_ident())
+            return self.next_invocation()
+
+        mock_runtime_client.next.side_effect = record_thread_id
+
+        runtime_client = LambdaRuntimeClient("localhost:1234", True)
+        for _ in range(3):
+            runtime_client.wait_next_invocation()
+
+        self.assertEqual(len(thread_ids), 3)
+        self.assertEqual(len(set(thread_ids)), 1)
+        self.assertNotEqual(thread_ids[0], threading.get_ident())
+
+    @patch("awslambdaric.lambda_runtime_client.runtime_client")
+    def test_wait_next_invocation_polling_thread_failure(self, mock_runtime_client):
+        mock_runtime_client.next.side_effect = [
+            RuntimeError("Failed to get next"),
+            self.next_invocation(),
+        ]
+
+        runtime_client = LambdaRuntimeClient("localhost:1234", True)
+        with self.assertRaises(FaultException) as cm:
+            runtime_client.wait_next_invocation()
+
+        self.assertEqual(
+            cm.exception.exception_type, FaultException.LAMBDA_RUNTIME_CLIENT_ERROR
+        )
+        self.assertEqual(runtime_client.wait_next_invocation().invoke_id, "RID1234")
+
+    def test_next_invocation_poller_resumes_interrupted_wait(self):
+        release = threading.Event()
+        calls = []
+
+        def get_next():
+            calls.append(None)
+            release.wait()
+            return len(calls)
+
+        poller = NextInvocationPoller(get_next)
+        results = poller._results
+        # Simulates a signal handler raising while the caller waits for the result.
+        poller._results = MagicMock()
+        poller._results.get.side_effect = KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            poller.next()
+
+        poller._results = results
+        release.set()
+        self.assertEqual(poller.next(), 1)
+        self.assertEqual(len(calls), 1)
+
+    @patch("awslambdaric.lambda_runtime_client.runtime_client")
+    def test_wait_next_invocation_async(self, mock_runtime_client):
+        mock_runtime_client.next.return_value = self.next_invocation()
+        runtime_client = LambdaRuntimeClient("localhost:1234")
+        ticks = []
+
+        async def wait_while_ticking():
+            async def tick():
+                while True:
+                    ticks.append(None)
+                    await asyncio.sleep(0)
+
+            task = asyncio.get_running_loop().create_task(tick())
+            try:
+                return await runtime_client.wait_next_invocation_async()
+            finally:
+                task.cancel()
+
+        event_request = asyncio.run(wait_while_ticking())
+
+        self.assertEqual(event_request.invoke_id, "RID1234")
+        self.assertEqual(event_request.event_body, b"{}")
+        self.assertTrue(ticks)
+
+    @patch("awslambdaric.lambda_runtime_client.runtime_client")
+    def test_wait_next_invocation_async_failure(self, mock_runtime_client):
+        runtime_client = LambdaRuntimeClient("localhost:1234")
+        runtime_client.handle_exception = MagicMock(side_effect=RuntimeError("boom"))
+        mock_runtime_client.next.side_effect = RuntimeError("boom")
+
+        with self.assertRaises(FaultException) as cm:
+            asyncio.run(runtime_client.wait_next_invocation_async())
+
+        self.assertIn("Failed to get next invocation: boom", cm.exception.msg)
+
     @patch("awslambdaric.lambda_runtime_client.runtime_client")
     def test_wait_next_invocation_without_tenant_id_header(self, mock_runtime_client):
         response_body = b"{}"
-        headers = {
-            "Lambda-Runtime-Aws-Request-Id": "RID1234",
-            "Lambda-Runtime-Trace-Id": "TID1234",
-            "Lambda-Runtime-Invoked-Function-Arn": "FARN1234",
-            "Lambda-Runtime-Deadline-Ms": 12,
-            "Lambda-Runtime-Client-Context": "client_context",
-            "Lambda-Runtime-Cognito-Identity": "cognito_identity",
-            "Content-Type": "application/json",
-        }
-        mock_runtime_client.next.return_value = response_body, headers
+        mock_runtime_client.next.return_value = self.next_invocation(
+            response_body, tenant_id=None
+        )
         runtime_client = LambdaRuntimeClient("localhost:1234")
 
         event_request = runtime_client.wait_next_invocation()
@@ -157,17 +304,9 @@ class TestLambdaRuntime(unittest.TestCase):
     @patch("awslambdaric.lambda_runtime_client.runtime_client")
     def test_wait_next_invocation_with_null_tenant_id_header(self, mock_runtime_client):
         response_body = b"{}"
-        headers = {
-            "Lambda-Runtime-Aws-Request-Id": "RID1234",
-            "Lambda-Runtime-Trace-Id": "TID1234",
-            "Lambda-Runtime-Invoked-Function-Arn": "FARN1234",
-            "Lambda-Runtime-Deadline-Ms": 12,
-            "Lambda-Runtime-Client-Context": "client_context",
-            "Lambda-Runtime-Cognito-Identity": "cognito_identity",
-            "Lambda-Runtime-Aws-Tenant-Id": None,
-            "Content-Type": "application/json",
-        }
-        mock_runtime_client.next.return_value = response_body, headers
+        mock_runtime_client.next.return_value = self.next_invocation(
+            response_body, tenant_id=None
+        )
         runtime_client = LambdaRuntimeClient("localhost:1234")
 
         event_request = runtime_client.wait_next_invocation()
@@ -181,17 +320,9 @@ class TestLambdaRuntime(unittest.TestCase):
         self, mock_runtime_client
     ):
         response_body = b"{}"
-        headers = {
-            "Lambda-Runtime-Aws-Request-Id": "RID1234",
-            "Lambda-Runtime-Trace-Id": "TID1234",
-            "Lambda-Runtime-Invoked-Function-Arn": "FARN1234",
-            "Lambda-Runtime-Deadline-Ms": 12,
-            "Lambda-Runtime-Client-Context": "client_context",
-            "Lambda-Runtime-Cognito-Identity": "cognito_identity",
-            "Lambda-Runtime-Aws-Tenant-Id": "",
-            "Content-Type": "application/json",
-        }
-        mock_runtime_client.next.return_value = response_body, headers
+        mock_runtime_client.next.return_value = self.next_invocation(
+            response_body, tenant_id=""
+        )
         runtime_client = LambdaRuntimeClient("localhost:1234")
 
         event_request = runtime_client.wait_next_invocation()
@@ -270,7 +401,11 @@ class TestLambdaRuntime(unittest.TestCase):
         runtime_client.post_invocation_result(invoke_id, response_data)
 
         mock_runtime_client.post_invocation_result.assert_called_once_with(
-            invoke_id, response_data.encode("utf-8"), "application/json"
+            invoke_id, response_data, "application/json"
+        )
+        self.assertIs(
+            mock_runtime_client.post_invocation_result.call_args.args[1],
+            response_data,
         )
 
     @patch("awslambdaric.lambda_runtime_client.runtime_client")
@@ -286,6 +421,28 @@ class TestLambdaRuntime(unittest.TestCase):
             invoke_id, response_data, content_type
         )
 
+    @patch("awslambdaric.lambda_runtime_client.runtime_client")
+    def test_post_invocation_result_buffer_data(self, mock_runtime_client):
+        runtime_client = LambdaRuntimeClient("localhost:1234")
+        invoke_id = "1234"
+        content_type = "application/octet-stream"
+
+        for response_data in (bytearray(b"binary_data"), memoryview(b"binary_data")):
+            with self.subTest(type(response_data).__name__):
+                mock_runtime_client.reset_mock()
+
+                runtime_client.post_invocation_result(
+                    invoke_id, response_data, content_type
+                )
+
+                mock_runtime_client.post_invocation_result.assert_called_once_with(
+                    invoke_id, response_data, content_type
+                )
+                self.assertIs(
+                    mock_runtime_client.post_invocation_result.call_args.args[1],
+                    response_data,
+                )
+
     @patch("awslambdaric.lambda_runtime_client.runtime_client")
     def test_post_invocation_result_failure(self, mock_runtime_client):
         runtime_client = LambdaRuntimeClient("localhost:1234")
@@ -382,6 +539,60 @@ class TestLambdaRuntime(unittest.TestCase):
         with self.assertRaises(RuntimeError):
             client.post_invocation_result("invoke_id", "result")
 
+    @patch("awslambdaric.lambda_runtime_client.runtime_client")
+    def test_deferred_result_is_posted_with_next_invocation(self, mock_runtime_client):
+        mock_runtime_client.post_and_next.return_value = self.next_invocation()
+        mock_runtime_client.next.return_value = self.next_invocation()
+        for use_thread in (False, True):
+            with self.subTest(use_thread_for_polling_next=use_thread):
+                mock_runtime_client.reset_mock()
+                client = LambdaRuntimeClient(
+                    "localhost:1234", use_thread, defer_result_posts=True
+                )
+
+                client.post_invocation_result("invoke_id", "result")
+                mock_runtime_client.post_invocation_result.assert_not_called()
+                event_request = client.wait_next_invocation()
+
+                mock_runtime_client.post_and_next.assert_called_once_with(
+                    "invoke_id", "result", "application/json"
+                )
+                mock_runtime_client.next.assert_not_called()
+                self.assertEqual(event_request.invoke_id, "RID1234")
+
+                client.wait_next_invocation()
+                mock_runtime_client.next.assert_called_once_with()
+
+    @patch("awslambdaric.lambda_runtime_client.runtime_client")
+    def test_deferred_result_post_failure_raises_if_not_multi_concurrent(
+        self, mock_runtime_client
+    ):
+        mock_runtime_client.PostError = PostError
+        mock_runtime_client.post_and_next.side_effect = PostError("failure")
+        client = LambdaRuntimeClient("localhost:1234", defer_result_posts=True)
+
+        client.post_invocation_result("invoke_id", "result")
+        with self.assertRaises(PostError):
+            client.wait_next_invocation()
+        mock_runtime_client.next.assert_not_called()
+
+    @patch("awslambdaric.lambda_runtime_client.runtime_client")
+    def test_deferred_result_post_failure_still_gets_next_if_multi_concurrent(
+        self, mock_runtime_client
+    ):
+        mock_runtime_client.PostError = PostError
+        mock_runtime_client.post_and_next.side_effect = PostError("failure")
+        mock_runtime_client.next.return_value = self.next_invocation()
+        client = LambdaMultiConcurrentRuntimeClient(
+            "localhost:1234", defer_result_posts=True
+        )
+
+        client.post_invocation_result("invoke_id", "result")
+        with self.assertLogs(level="WARNING"):
+            event_request = client.wait_next_invocation()
+
+        self.assertEqual(event_request.invoke_id, "RID1234")
+
     @patch("awslambdaric.lambda_runtime_client.runtime_client")
     def test_post_invocation_error_suppresses_error_if_multi_concurrent(
         self, mock_runtime_client
@@ -537,6 +748,71 @@ class TestLambdaRuntime(unittest.TestCase):
         )
         mock_response.read.assert_called_once()
 
+    @patch("http.client.HTTPConnection", autospec=http.client.HTTPConnection)
+    def test_call_rapid_reuses_connection(self, MockHTTPConnection):
+        mock_conn = MockHTTPConnection.return_value
+        mock_response = MagicMock(autospec=http.client.HTTPResponse)
+        mock_conn.getresponse.return_value = mock_response
+        mock_response.read.return_value = b""
+        mock_response.code = http.HTTPStatus.ACCEPTED
+        mock_response.will_close = False
+
+        runtime_client = LambdaRuntimeClient("localhost:1234")
+        runtime_client.post_init_error(self.error_result)
+        runtime_client.report_restore_error(self.restore_error_result)
+
+        MockHTTPConnection.assert_called_once_with("localhost:1234")
+        mock_conn.connect.assert_called_once()
+        self.assertEqual(mock_conn.request.call_count, 2)
+
+        timing = runtime_client.rapid_connection.last_call_timing
+        self.assertEqual(timing.endpoint, "/2018-06-01/runtime/restore/error")
+        self.assertEqual(timing.status, http.HTTPStatus.ACCEPTED)
+        self.assertTrue(timing.reused)
+        self.assertGreaterEqual(timing.duration_ms, 0)
+
+    @patch("http.client.HTTPConnection", autospec=http.client.HTTPConnection)
+    def test_call_rapid_reconnects_stale_connection(self, MockHTTPConnection):
+        stale_conn = MagicMock()
+        fresh_conn = MagicMock()
+        MockHTTPConnection.side_effect = [stale_conn, fresh_conn]
+        mock_response = MagicMock(autospec=http.client.HTTPResponse)
+        mock_response.read.return_value = b""
+        mock_response.code = http.HTTPStatus.ACCEPTED
+        mock_response.will_close = False
+        stale_conn.getresponse.side_effect = [
+            mock_response,
+            http.client.RemoteDisconnected("closed"),
+        ]
+        fresh_conn.getresponse.return_value = mock_response
+
+        runtime_client = LambdaRuntimeClient("localhost:1234")
+        runtime_client.post_init_error(self.error_result)
+        runtime_client.post_init_error(self.error_result)
+
+        self.assertEqual(MockHTTPConnection.call_count, 2)
+        stale_conn.close.assert_called_once()
+        fresh_conn.request.assert_called_once()
+        self.assertFalse(runtime_client.rapid_connection.last_call_timing.reused)
+
+    @patch("http.client.HTTPConnection", autospec=http.client.HTTPConnection)
+    def test_restore_next_recreates_connection(self, MockHTTPConnection):
+        mock_conn = MockHTTPConnection.return_value
+        mock_response = MagicMock(autospec=http.client.HTTPResponse)
+        mock_conn.getresponse.return_value = mock_response
+        mock_response.read.return_value = b""
+        mock_response.code = http.HTTPStatus.OK
+        mock_response.will_close = False
+
+        runtime_client = LambdaRuntimeClient("localhost:1234")
+        runtime_client.restore_next()
+        mock_conn.close.assert_called_once()
+
+        mock_response.code = http.HTTPStatus.ACCEPTED
+        runtime_client.report_restore_error(self.restore_error_result)
+
+        self.assertEqual(MockHTTPConnection.call_count, 2)
+
     def test_connection_refused(self):
         with self.assertRaises(ConnectionRefusedError):
             runtime_client = LambdaRuntimeClient("127.0.0.1:1")
@@ -3,10 +3,24 @@ Copyright 2019 Amazon.com, Inc. or its affiliates. All Rights Reserved.
 """
 
 import decimal
+import mmap
 import os
+import timeit
 import unittest
+from unittest.mock import patch
+
+import simplejson
 from parameterized import parameterized
-from awslambdaric.lambda_runtime_marshaller import to_json
+from awslambdaric import lambda_runtime_marshaller
+from awslambdaric.lambda_runtime_exception import FaultException
+from awslambdaric.lambda_runtime_marshaller import (
+    Encoder,
+    LambdaMarshaller,
+    LambdaResponse,
+    LazyEvent,
+    register_codec,
+    to_json,
+)
 
 
 class TestLambdaRuntimeMarshaller(unittest.TestCase):
@@ -39,6 +53,7 @@ class TestLambdaRuntimeMarshaller(unittest.TestCase):
 
     def tearDown(self):
         os.environ = self.org_os_environ
+        lambda_runtime_marshaller._select_encoder()
 
     def test_to_json_decimal_encoding(self):
         response = to_json({"pi": decimal.Decimal("3.14159")})
@@ -52,6 +67,58 @@ class TestLambdaRuntimeMarshaller(unittest.TestCase):
         response = to_json({"pi": decimal.Decimal("-nan")})
         self.assertEqual('{"pi": NaN}', response)
 
+    @unittest.skipUnless(
+        lambda_runtime_marshaller._NATIVE_DECIMALS,
+        "simplejson does not encode NaN decimals natively",
+    )
+    def test_decimals_are_encoded_without_default_callback(self):
+        with patch.object(Encoder, "default", side_effect=AssertionError):
+            response = Encoder(ensure_ascii=True).encode(
+                [decimal.Decimal("1.10"), decimal.Decimal("-1E+3")]
+            )
+
+        self.assertEqual(response, "[1.10, -1E+3]")
+
+    def test_decimal_encoding_without_native_decimals(self):
+        values = [decimal.Decimal(v) for v in ("1.10", "-NaN", "sNaN", "-Infinity")]
+        encoder = Encoder()
+        encoder.use_decimal = False
+
+        self.assertEqual(encoder.encode(values), to_json(values))
+        self.assertEqual(to_json(values), "[1.10, NaN, NaN, -Infinity]")
+
+    def test_unmarshal_request_from_memoryview(self):
+        event = LambdaMarshaller().unmarshal_request(
+            memoryview('{"price": "£1.00"}'.encode("utf-8"))
+        )
+        self.assertEqual(event, {"price": "£1.00"})
+
+    def test_unmarshal_binary_request_from_memoryview(self):
+        event = LambdaMarshaller().unmarshal_request(
+            memoryview(b"\x00\x01"), "application/octet-stream"
+        )
+        self.assertEqual(event, b"\x00\x01")
+        self.assertIsInstance(event, bytes)
+
+    def test_unmarshal_request_from_invalid_utf8_memoryview(self):
+        with self.assertRaises(FaultException) as cm:
+            LambdaMarshaller().unmarshal_request(memoryview(b'"\xff"'))
+        self.assertEqual(cm.exception.exception_type, FaultException.UNMARSHAL_ERROR)
+
+    def test_marshal_buffer_response(self):
+        mapped = mmap.mmap(-1, 4)
+        mapped.write(b"mmap")
+        for response in (
+            b"bytes",
+            bytearray(b"bytearray"),
+            memoryview(b"view"),
+            mapped,
+        ):
+            with self.subTest(type(response).__name__):
+                result, content_type = LambdaMarshaller().marshal_response(response)
+                self.assertIs(result, response)
+                self.assertEqual(content_type, "application/unknown")
+
     def test_json_serializer_is_not_default_json(self):
         from awslambdaric.lambda_runtime_marshaller import (
             json as internal_json,
@@ -69,9 +136,39 @@ class TestLambdaRuntimeMarshaller(unittest.TestCase):
         self.assertFalse(hasattr(stock_json, "YOLO"))
         self.assertTrue(hasattr(simplejson, "YOLO"))
 
+    def test_to_json_encoder_is_selected_once(self):
+        encoder = lambda_runtime_marshaller._encoder
+        os.environ = {"AWS_EXECUTION_ENV": "AWS_Lambda_python3.12"}
+
+        to_json({"price": "£1.00"})
+
+        self.assertIs(lambda_runtime_marshaller._encoder, encoder)
+        self.assertIs(LambdaMarshaller().jsonEncoder, encoder)
+
+    def test_to_json_is_cheaper_than_building_an_encoder_per_call(self):
+        error = {
+            "errorMessage": "boom",
+            "errorType": "ValueError",
+            "requestId": "8f507cfc-7c05-4d6a-a8f9-5e7a1c3e1b2f",
+            "stackTrace": ['  File "/var/task/app.py", line 3, in handler\n'],
+        }
+
+        def per_call_encoder():
+            return Encoder().encode(error)
+
+        def cached_encoder():
+            return to_json(error)
+
+        self.assertEqual(per_call_encoder(), cached_encoder())
+        per_call = min(timeit.repeat(per_call_encoder, number=2000, repeat=5))
+        cached = min(timeit.repeat(cached_encoder, number=2000, repeat=5))
+        self.assertLess(cached, per_call)
+
     @parameterized.expand(execution_envs_lambda_marshaller_ensure_ascii_false)
     def test_to_json_unicode_not_escaped_encoding(self, execution_env):
         os.environ = {"AWS_EXECUTION_ENV": execution_env}
+        # The encoder is chosen once, when the module is imported.
+        lambda_runtime_marshaller._select_encoder()
         response = to_json({"price": "£1.00"})
         self.assertEqual('{"price": "£1.00"}', response)
         self.assertNotEqual('{"price": "\\u00a31.00"}', response)
@@ -82,9 +179,258 @@ class TestLambdaRuntimeMarshaller(unittest.TestCase):
     @parameterized.expand(execution_envs_lambda_marshaller_ensure_ascii_true)
     def test_to_json_unicode_is_escaped_encoding(self, execution_env):
         os.environ = {"AWS_EXECUTION_ENV": execution_env}
+        # The encoder is chosen once, when the module is imported.
+        lambda_runtime_marshaller._select_encoder()
         response = to_json({"price": "£1.00"})
         self.assertEqual('{"price": "\\u00a31.00"}', response)
         self.assertNotEqual('{"price": "£1.00"}', response)
         self.assertEqual(
             23, len(response.encode("utf-8"))
         )  # would be 19 bytes if a escaped was returned
+
+
+class TestJsonEngines(unittest.TestCase):
+    payloads = (
+        b'{"body": "{\\"key\\": [1, 2.5, null]}", "isBase64Encoded": false}',
+        '{"price": "£1.00", "emoji": "\\ud83d\\ude00"}'.encode("utf-8"),
+        b'{"big": 123456789012345678901234567890, "small": -9223372036854775809}',
+        b'{"float": 0.1, "exp": 1e-7, "huge": 1e400}',
+        b'[{"a": {"b": {"c": []}}}, "", true]',
+        b'{"dup": 1, "dup": 2}',
+    )
+
+    def setUp(self):
+        self.org_os_environ = os.environ
+
+    def tearDown(self):
+        os.environ = self.org_os_environ
+        lambda_runtime_marshaller._select_json_engine()
+
+    def select(self, engine):
+        os.environ = {"AWS_LAMBDA_JSON_ENGINE": engine}
+        return lambda_runtime_marshaller._select_json_engine()
+
+    @parameterized.expand(["simplejson", "json", "orjson"])
+    def test_engines_decode_like_simplejson(self, engine):
+        self.assertIn(self.select(engine), (engine, "simplejson"))
+        marshaller = LambdaMarshaller()
+
+        for payload in self.payloads:
+            expected = simplejson.loads(payload)
+            for request in (payload, memoryview(payload), payload.decode("utf-8")):
+                with self.subTest(request=request):
+                    result = marshaller.unmarshal_request(request)
+                    self.assertEqual(result, expected)
+
+    @parameterized.expand(["simplejson", "json", "orjson"])
+    def test_engines_report_simplejson_errors(self, engine):
+        self.select(engine)
+
+        for payload in (b'{"key": ', b'{"nan": NaN}', b'{"inf": -Infinity}'):
+            with self.subTest(payload=payload):
+                with self.assertRaises(FaultException) as cm:
+                    LambdaMarshaller().unmarshal_request(memoryview(payload))
+                with self.assertRaises(simplejson.JSONDecodeError) as expected:
+                    simplejson.loads(payload)
+                self.assertEqual(
+                    cm.exception.msg,
+                    "Unable to unmarshal input: {}".format(expected.exception),
+                )
+
+    def test_selected_engines(self):
+        self.assertEqual(self.select("simplejson"), "simplejson")
+        self.assertEqual(self.select("json"), "json")
+        self.assertIn(self.select("auto"), ("orjson", "json"))
+
+    @patch.dict("sys.modules", {"orjson": None})
+    def test_auto_falls_back_when_orjson_is_missing(self):
+        self.assertEqual(self.select("auto"), "json")
+        self.assertEqual(self.select("orjson"), "simplejson")
+
+    def test_engine_failing_probe_is_skipped(self):
+        def lossy_loads(request):
+            return simplejson.loads(request, use_decimal=True)
+
+        with patch.dict(
+            lambda_runtime_marshaller._JSON_ENGINES, {"json": lambda: lossy_loads}
+        ):
+            self.assertEqual(self.select("json"), "simplejson")
+
+    def test_unknown_engine_is_auto_detected(self):
+        self.assertEqual(self.select("yaml"), self.select("auto"))
+
+
+class TestLazyEvent(unittest.TestCase):
+    def setUp(self):
+        self.marshaller = LambdaMarshaller(lazy_events=True)
+
+    def test_lazy_events_are_off_by_default(self):
+        self.assertIsInstance(LambdaMarshaller().unmarshal_request(b"{}"), dict)
+
+    @patch.dict(os.environ, {"AWS_LAMBDA_LAZY_EVENTS": "true"})
+    def test_lazy_events_enabled_by_env_var(self):
+        self.assertIsInstance(LambdaMarshaller().unmarshal_request(b"{}"), LazyEvent)
+
+    def test_event_is_decoded_on_first_access_only(self):
+        payload = memoryview(b' {"source": "aws.events", "detail": {"n": 1}}')
+
+        with patch.object(
+            lambda_runtime_marshaller,
+            "_json_loads",
+            wraps=lambda_runtime_marshaller._json_loads,
+        ) as json_loads:
+            event = self.marshaller.unmarshal_request(payload)
+            self.assertIs(event.raw, payload)
+            json_loads.assert_not_called()
+
+            self.assertEqual(event["source"], "aws.events")
+            self.assertEqual(event.get("detail"), {"n": 1})
+            self.assertIn("detail", event)
+            self.assertEqual(len(event), 2)
+            self.assertEqual(dict(event), {"source": "aws.events", "detail": {"n": 1}})
+            json_loads.assert_called_once_with(payload)
+
+    def test_non_object_events_are_decoded_eagerly(self):
+        self.assertEqual(self.marshaller.unmarshal_request(b"[1, 2]"), [1, 2])
+        self.assertEqual(self.marshaller.unmarshal_request('"text"'), "text")
+
+    def test_invalid_event_raises_unmarshal_error_on_access(self):
+        event = self.marshaller.unmarshal_request(b'{"key": ')
+
+        with self.assertRaises(FaultException) as cm:
+            event["key"]
+
+        self.assertEqual(cm.exception.exception_type, "Runtime.UnmarshalError")
+
+    def test_untouched_event_is_encoded_from_raw_payload(self):
+        event = self.marshaller.unmarshal_request(memoryview(b'{"b": 1,  "a": 2}'))
+
+        response, content_type = self.marshaller.marshal_response(
+            {"echo": event, "n": 1}
+        )
+
+        self.assertEqual(response, '{"echo": {"b": 1,  "a": 2}, "n": 1}')
+        self.assertEqual(content_type, "application/json")
+
+    def test_decoded_event_is_encoded_from_decoded_value(self):
+        event = self.marshaller.unmarshal_request(b'{"b": 1,  "a": 2}')
+        event["a"]
+
+        self.assertEqual(to_json(event), '{"b": 1, "a": 2}')
+
+
+class TestCodecs(unittest.TestCase):
+    def setUp(self):
+        self.marshaller = LambdaMarshaller()
+        self.codecs = dict(lambda_runtime_marshaller._CODECS)
+
+    def tearDown(self):
+        lambda_runtime_marshaller._CODECS.clear()
+        lambda_runtime_marshaller._CODECS.update(self.codecs)
+
+    def test_unmarshal_by_content_type(self):
+        for content_type, payload, event in (
+            ("application/json; charset=utf-8", b'{"a": 1}', {"a": 1}),
+            ("application/x-ndjson", b'{"a": 1}\n\n[2]\n', [{"a": 1}, [2]]),
+            (
+                "application/x-www-form-urlencoded",
+                b"a=1&a=2&b=&c=%C2%A3",
+                {"a": ["1", "2"], "b": [""], "c": ["\u00a3"]},
+            ),
+            ("Application/Base64", b"AAGq", b"\x00\x01\xaa"),
+        ):
+            with self.subTest(content_type=content_type):
+                self.assertEqual(
+                    self.marshaller.unmarshal_request(
+                        memoryview(payload), content_type
+                    ),
+                    event,
+                )
+
+    def test_unknown_content_type_is_passed_as_bytes(self):
+        self.assertEqual(
+            self.marshaller.unmarshal_request(memoryview(b"\x89PNG"), "image/png"),
+            b"\x89PNG",
+        )
+        self.assertEqual(self.marshaller.unmarshal_request(b"raw", None), b"raw")
+
+    def test_invalid_payload_raises_unmarshal_error(self):
+        for content_type, payload in (
+            ("application/x-ndjson", b'{"a": 1}\n{'),
+            ("application/base64", b"not base64!"),
+        ):
+            with self.subTest(content_type=content_type):
+                with self.assertRaises(FaultException) as cm:
+                    self.marshaller.unmarshal_request(payload, content_type)
+                self.assertEqual(cm.exception.exception_type, "Runtime.UnmarshalError")
+
+    def test_marshal_typed_response(self):
+        for response, expected in (
+            (
+                LambdaResponse([{"a": 1}, 2], "application/x-ndjson"),
+                ('{"a": 1}\n2\n', "application/x-ndjson"),
+            ),
+            (
+                LambdaResponse(
+                    {"a": ["1", "2"], "b": "\u00a3"},
+                    "application/x-www-form-urlencoded",
+                ),
+                ("a=1&a=2&b=%C2%A3", "application/x-www-form-urlencoded"),
+            ),
+            (
+                LambdaResponse({"a": 1}, "application/json; charset=utf-8"),
+                ('{"a": 1}', "application/json; charset=utf-8"),
+            ),
+            (
+                LambdaResponse(b"\x89PNG", "image/png"),
+                (b"\x89PNG", "image/png"),
+            ),
+            (
+                LambdaResponse("<p>hi</p>", "text/html"),
+                ("<p>hi</p>", "text/html"),
+            ),
+        ):
+            with self.subTest(response=response):
+                self.assertEqual(self.marshaller.marshal_response(response), expected)
+
+    def test_base64_response_encodes_bytes_like_body(self):
+        self.assertEqual(
+            self.marshaller.marshal_response(
+                LambdaResponse(bytearray(b"\x00\x01\xaa"), "application/base64")
+            ),
+            (b"AAGq", "application/base64"),
+        )
+
+    def test_typed_response_without_codec_raises_marshal_error(self):
+        with self.assertRaises(FaultException) as cm:
+            self.marshaller.marshal_response(
+                LambdaResponse({"a": 1}, "application/msgpack")
+            )
+
+        self.assertEqual(cm.exception.exception_type, "Runtime.MarshalError")
+        self.assertIn("application/msgpack", cm.exception.msg)
+
+    def test_registered_codec_is_used_both_ways(self):
+        register_codec(
+            "application/vnd.test",
+            decode=lambda payload: bytes(payload).split(b","),
+            encode=lambda body: b",".join(body),
+        )
+
+        event = self.marshaller.unmarshal_request(
+            memoryview(b"a,b"), "application/vnd.test; v=1"
+        )
+        response = self.marshaller.marshal_response(
+            LambdaResponse(tuple(reversed(event)), "application/vnd.test")
+        )
+
+        self.assertEqual(event, [b"a", b"b"])
+        self.assertEqual(response, (b"b,a", "application/vnd.test"))
+
+    def test_failing_codec_raises_marshal_error(self):
+        register_codec("application/vnd.test", encode=lambda body: 1 / 0)
+
+        with self.assertRaises(FaultException) as cm:
+            self.marshaller.marshal_response(LambdaResponse({}, "application/vnd.test"))
+
+        self.assertEqual(cm.exception.exception_type, "Runtime.MarshalError")
@@ -0,0 +1,238 @@
+"""
+Copyright 2026 Amazon.com, Inc. or its affiliates. All Rights Reserved.
+"""
+
+import base64
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+from awslambdaric import lambda_runtime_socket_client
+from awslambdaric.lambda_runtime_client import _load_runtime_client
+from awslambdaric.lambda_runtime_socket_client import (
+    InvocationRequest,
+    PostError,
+    RuntimeApiConnection,
+)
+from tests.fake_runtime_api import FakeRuntimeApi
+
+
+class TestRuntimeApiConnection(unittest.TestCase):
+    def setUp(self):
+        self.api = FakeRuntimeApi().__enter__()
+        self.connection = RuntimeApiConnection(self.api.address, "test-agent")
+
+    def tearDown(self):
+        self.connection.close()
+        self.api.__exit__(None, None, None)
+
+    def test_next(self):
+        self.api.add_event(
+            b'{"key": "value"}',
+            request_id="RID1234",
+            deadline_ms=1234,
+            **{
+                "Lambda-Runtime-Trace-Id": "TID1234",
+                "Lambda-Runtime-Aws-Tenant-Id": "tenant",
+            },
+        )
+
+        self.assertEqual(
+            self.connection.next(),
+            InvocationRequest(
+                invoke_id="RID1234",
+                x_amzn_trace_id="TID1234",
+                invoked_function_arn="function-arn",
+                deadline_time_in_ms=1234,
+                client_context=None,
+                cognito_identity=None,
+                tenant_id="tenant",
+                content_type="application/json",
+                event_body=b'{"key": "value"}',
+            ),
+        )
+
+    def test_post_invocation_result(self):
+        self.connection.post_invocation_result(
+            "RID1234", b"binary", "application/octet-stream"
+        )
+
+        path, headers, body, _ = self.api.wait_for_posts(1)[0]
+        self.assertEqual(path, "/2018-06-01/runtime/invocation/RID1234/response")
+        self.assertEqual(headers["Content-Type"], "application/octet-stream")
+        self.assertEqual(headers["User-Agent"], "test-agent")
+        self.assertEqual(body, b"binary")
+
+    def test_post_buffer_invocation_result(self):
+        payload = bytearray(b"x" * (256 * 1024))
+
+        self.connection.post_invocation_result(
+            "RID1234", memoryview(payload), "application/octet-stream"
+        )
+
+        self.assertEqual(self.api.wait_for_posts(1)[0][2], payload)
+
+    def test_post_str_invocation_result(self):
+        self.connection.post_invocation_result(
+            "RID1234", '{"price": "£1.00"}', "application/json"
+        )
+
+        self.assertEqual(
+            self.api.wait_for_posts(1)[0][2], '{"price": "£1.00"}'.encode("utf-8")
+        )
+
+    def test_post_large_invocation_result(self):
+        payload = b"x" * (1024 * 1024)
+
+        self.connection.post_invocation_result("RID1234", payload, "application/json")
+
+        self.assertEqual(self.api.wait_for_posts(1)[0][2], payload)
+
+    def test_post_error(self):
+        self.connection.post_error("RID1234", '{"errorMessage": "£"}', "xray")
+
+        path, headers, body, _ = self.api.wait_for_posts(1)[0]
+        self.assertEqual(path, "/2018-06-01/runtime/invocation/RID1234/error")
+        self.assertEqual(headers["Lambda-Runtime-Function-XRay-Error-Cause"], "xray")
+        self.assertEqual(body, '{"errorMessage": "£"}'.encode("utf-8"))
+
+    def test_connection_is_kept_alive(self):
+        for i in range(3):
+            self.api.add_event(b"{}", request_id=f"RID{i}")
+            self.connection.next()
+            self.connection.post_invocation_result(f"RID{i}", b"{}", "application/json")
+
+        self.assertEqual(len(self.api.wait_for_posts(3)), 3)
+        self.assertEqual(self.api.connections, 1)
+
+    def test_reconnects_stale_connection(self):
+        self.connection.post_invocation_result("RID1", b"{}", "application/json")
+        self.connection._sock.shutdown(2)
+
+        self.connection.post_invocation_result("RID2", b"{}", "application/json")
+
+        self.assertEqual(len(self.api.wait_for_posts(2)), 2)
+        self.assertEqual(self.api.connections, 2)
+
+    def test_request_is_not_resent_once_fully_sent(self):
+        self.connection.post_invocation_result("RID1", b"{}", "application/json")
+
+        with patch.object(
+            self.connection, "_read_response", side_effect=ConnectionResetError
+        ), patch.object(
+            self.connection, "_connect", wraps=self.connection._connect
+        ) as connect:
+            with self.assertRaisesRegex(
+                RuntimeError, "Failed to post invocation response"
+            ):
+                self.connection.post_invocation_result(
+                    "RID2", b"{}", "application/json"
+                )
+
+        connect.assert_not_called()
+        self.assertEqual(len(self.api.wait_for_posts(2)), 2)
+
+    def test_reconnects_when_sending_on_reused_connection_fails(self):
+        self.connection.post_invocation_result("RID1", b"{}", "application/json")
+        send = self.connection._send
+        calls = []
+
+        def send_once_failing(head, body):
+            calls.append(head)
+            if len(calls) == 1:
+                raise BrokenPipeError()
+            send(head, body)
+
+        with patch.object(self.connection, "_send", side_effect=send_once_failing):
+            self.connection.post_invocation_result("RID2", b"{}", "application/json")
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.api.wait_for_posts(2)[1][0].split("/")[-2], "RID2")
+
+    def test_post_invocation_stream(self):
+        on_error = MagicMock()
+
+        self.connection.post_invocation_stream(
+            "RID1234",
+            iter([b"hello ", "wörld", b"", bytearray(b"x" * (128 * 1024))]),
+            "text/plain",
+            on_error,
+        )
+
+        path, headers, body, trailers = self.api.wait_for_posts(1)[0]
+        self.assertEqual(path, "/2018-06-01/runtime/invocation/RID1234/response")
+        self.assertEqual(headers["Content-Type"], "text/plain")
+        self.assertEqual(headers["Lambda-Runtime-Function-Response-Mode"], "streaming")
+        self.assertEqual(body, "hello wörld".encode("utf-8") + b"x" * (128 * 1024))
+        self.assertEqual(trailers, {})
+        on_error.assert_not_called()
+
+    def test_post_invocation_stream_error_is_sent_in_trailers(self):
+        def chunks():
+            yield b"partial"
+            raise ValueError("boom")
+
+        on_error = MagicMock(return_value=("ValueError", '{"errorMessage": "boom"}'))
+
+        self.connection.post_invocation_stream(
+            "RID1234", chunks(), "application/octet-stream", on_error
+        )
+
+        _, _, body, trailers = self.api.wait_for_posts(1)[0]
+        self.assertEqual(body, b"partial")
+        self.assertEqual(trailers["Lambda-Runtime-Function-Error-Type"], "ValueError")
+        self.assertEqual(
+            base64.b64decode(trailers["Lambda-Runtime-Function-Error-Body"]),
+            b'{"errorMessage": "boom"}',
+        )
+        self.assertIs(on_error.call_args[0][0][0], ValueError)
+
+    def test_post_invocation_stream_reconnects_dropped_connection(self):
+        self.connection.post_invocation_result("RID1", b"{}", "application/json")
+        self.connection._sock.shutdown(2)
+
+        self.connection.post_invocation_stream(
+            "RID2", iter([b"data"]), "application/octet-stream", MagicMock()
+        )
+
+        self.assertEqual(self.api.wait_for_posts(2)[1][2], b"data")
+        self.assertEqual(self.api.connections, 2)
+
+    def test_post_and_next(self):
+        self.api.add_event(b'{"next": true}', request_id="RID2")
+
+        request = self.connection.post_and_next("RID1", b"{}", "application/json")
+
+        self.assertEqual(request.event_body, b'{"next": true}')
+        self.assertEqual(request.invoke_id, "RID2")
+        path, _, posted_body, _ = self.api.wait_for_posts(1)[0]
+        self.assertEqual(path, "/2018-06-01/runtime/invocation/RID1/response")
+        self.assertEqual(posted_body, b"{}")
+
+    def test_post_and_next_post_failure_raises_post_error(self):
+        connection = RuntimeApiConnection("127.0.0.1:1", "test-agent")
+
+        with self.assertRaisesRegex(PostError, "Failed to post invocation response"):
+            connection.post_and_next("RID1", b"{}", "application/json")
+
+    def test_failure_raises_runtime_error(self):
+        connection = RuntimeApiConnection("127.0.0.1:1", "test-agent")
+
+        with self.assertRaisesRegex(RuntimeError, "Failed to get next"):
+            connection.next()
+        with self.assertRaisesRegex(RuntimeError, "Failed to post invocation error"):
+            connection.post_error("RID1234", "{}", "")
+
+
+class TestRuntimeClientTransportSelection(unittest.TestCase):
+    @patch.dict(os.environ, {"AWS_LAMBDA_RUNTIME_CLIENT_TRANSPORT": "python"})
+    def test_python_transport_selected_by_env_var(self):
+        self.assertIs(_load_runtime_client(), lambda_runtime_socket_client)
+
+    @patch.dict("sys.modules", {"runtime_client": None})
+    def test_python_transport_used_when_native_client_is_missing(self):
+        self.assertIs(_load_runtime_client(), lambda_runtime_socket_client)
+
+
+if __name__ == "__main__":
+    unittest.main()
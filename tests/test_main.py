@@ -26,7 +26,9 @@ class TestMain(unittest.TestCase):
 
         package_entry.main(["prog", "my.handler"])
 
-        mock_client_cls.assert_called_once_with("http://addr", False)
+        mock_client_cls.assert_called_once_with(
+            "http://addr", False, defer_result_posts=True
+        )
         mock_bootstrap.run.assert_called_once_with(
             "my.handler", mock_client_cls.return_value
         )
@@ -55,7 +55,7 @@ class TestMultiConcurrentRunnerRedirect(unittest.TestCase):
         with patch.object(MultiConcurrentRunner, "_redirect_output"):
             MultiConcurrentRunner.run_single("h.fn", "addr", True, "/socket")
 
-        mock_client_cls.assert_called_once_with("addr", True)
+        mock_client_cls.assert_called_once_with("addr", True, defer_result_posts=True)
         mock_bootstrap.run.assert_called_once_with("h.fn", mock_client)
 
     @patch("multiprocessing.Process")
@@ -94,7 +94,7 @@ class TestMultiConcurrentRunnerRedirect(unittest.TestCase):
         mock_redirect.assert_not_called()
 
         # Verify client and bootstrap are still called normally
-        mock_client_cls.assert_called_once_with("addr", True)
+        mock_client_cls.assert_called_once_with("addr", True, defer_result_posts=True)
         mock_bootstrap.run.assert_called_once_with("h.fn", mock_client)
 
     @patch(
@@ -115,7 +115,7 @@ class TestMultiConcurrentRunnerRedirect(unittest.TestCase):
         mock_redirect.assert_called_once_with("/valid/socket/path")
 
         # Verify client and bootstrap are still called normally
-        mock_client_cls.assert_called_once_with("addr", True)
+        mock_client_cls.assert_called_once_with("addr", True, defer_result_posts=True)
         mock_bootstrap.run.assert_called_once_with("h.fn", mock_client)
 
 